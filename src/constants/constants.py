@@ -15,8 +15,43 @@ VIS_FONT_BOLD_PATH = str(Path(__file__).parent.parent.parent.absolute()) + '/fon
 OCR_OUTPUT_PATH = str(Path(__file__).parent.parent.parent.absolute()) + '/output/'
 CONFIG_PATH = str(Path(__file__).parent.parent.parent.absolute()) + '/config.ini'
 DICTS_PATH = str(Path(__file__).parent.parent.parent.absolute()) + '/dicts/'
+########### storage ###########
+# page files are written without indentation if set
+COMPACT_JSON = False
+# extension (and thereby codec) of page files extracted from a pages JSONL: .json, .json.gz or .json.bz2
+PAGE_EXTENSION = '.json'
+
+########### cache ###########
+# directory of the persistent caches, caching is disabled if None
+CACHE_PATH = None
+# maximum size of the block ocr cache in MB
+OCR_CACHE_SIZE = 1024
+# maximum size of the decoded page raster cache in MB, rasters are not cached if 0
+RASTER_CACHE_SIZE = 0
+# spell checks are kept in a word cache inside the cache directory, shared by runs and worker processes
+WORD_CACHE = False
+# number of words per language whose spell checks are kept in memory (least recently used words are dropped beyond)
+SPELL_CACHE_SIZE = 100000
+
 ########### bin ###########
 LINE_IMG_PAD = 30
+# the line coordinates of the page JSON are used instead of segmenting blocks (segmentation only as fallback)
+PAGE_LINES = False
+
+########### triage ###########
+# blocks are checked before binarization and dropped if hopeless (see "triage_block")
+TRIAGE = False
+# only every TRIAGE_STRIDE-th row and column is looked at
+TRIAGE_STRIDE = 4
+# minimum length in pixels of the shorter side and maximum ratio between the longer and the shorter side
+TRIAGE_MIN_SIDE = 12
+TRIAGE_MAX_ASPECT = 60
+# minimum and maximum share of ink pixels and minimum difference between ink and background (grey levels)
+TRIAGE_MIN_INK = 0.002
+TRIAGE_MAX_INK = 0.35
+TRIAGE_MIN_CONTRAST = 40
+# a block is rotated if the variation of its column profile exceeds TRIAGE_ROTATION times that of its row profile
+TRIAGE_ROTATION = 1.5
 
 ########### fcr ###########
 N_CHARS_FCR = 15
@@ -71,6 +106,7 @@ DEFAULT_K = 27
 BLOCK_TYPES_ALTO = [
 	["PARAGRAPH", "TEXT"]
 ]
+TARGET_ITEM_TYPES = None
 IMG_CROP_TOLERANCE = 2
 
 ########### ocr ###########
@@ -78,6 +114,12 @@ ART_LINE_WORDS_MIN = 6
 ART_LINE_WORDS_MAX = 13
 HYPHENS = {'-','⸗','='}
 WHITE_LIST = set()
+# only the lines of a block that look bad are recognized again, the other lines keep their original text
+LINE_OCR = False
+# a line looks bad if the share of its characters found in the dictionary is below LINE_MIN_DICT
+# or if its garbage score exceeds LINE_MAX_GARBAGE
+LINE_MIN_DICT = 0.5
+LINE_MAX_GARBAGE = 0.25
 VOWELS = set()
 REPLACEMENTS = {
 	"⅓": "1/3",
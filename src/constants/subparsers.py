@@ -21,8 +21,43 @@ SUBPARSERS = {
 	'enhance': {
 		'args': [
 			['-d', '--directory', True, None, readable_folder, 'store', 'Path to directory containing all orignal issues along with pages and images'],
-			['-r', '--required', False, 0.0, float, 'store', 'Value for minimum required enhancement prediction']
+			['-r', '--required', False, 0.0, float, 'store', 'Value for minimum required enhancement prediction'],
+			['-w', '--workers', False, 1, int, 'store', 'Number of worker processes, each processing whole issues'],
+			['-t', '--threads', False, 0, int, 'store', 'Number of preprocessing threads for pipelined execution inside an issue (0 for serial execution)'],
+			['-b', '--blocks', False, False, None, 'store_true', 'Distribute single blocks of all issues over the workers (work stealing) instead of whole issues'],
+			['-f', '--force', False, False, None, 'store_true', 'Ignore the run manifests of previous runs and reprocess all pages'],
+			['-j', '--jsonl', False, False, None, 'store_true', 'Stream the pages JSONL (.jsonl or .jsonl.bz2) files of the issues and write enhanced pages JSONL files'],
+			['-c', '--compact', False, False, None, 'store_true', 'Write page JSON (and JSONL) files without indentation'],
+			['-z', '--compression', False, 'json', str, 'store', 'Storage format of page files extracted from S3: json, gz or bz2'],
+			['-s', '--sparse', False, False, None, 'store_true', 'Write one sidecar per issue holding only the new ocr results instead of copying all pages'],
+			['-k', '--cache', False, None, str, 'store', 'Directory of the persistent block ocr cache, reused by later runs (no caching if not set)'],
+			['-m', '--cache_size', False, 1024, int, 'store', 'Maximum size of the block ocr cache in MB, least recently used blocks are evicted beyond'],
+			['-g', '--raster_cache', False, 0, int, 'store', 'Maximum size in MB of the decoded page raster cache inside the --cache directory (0 to disable)'],
+			['-v', '--word_cache', False, False, None, 'store_true', 'Keep the spell checks of the dictionary scores in a word cache inside the --cache directory, shared by later runs and workers'],
+			['-e', '--budget', False, 0.0, float, 'store', 'Budget in seconds: ocr the blocks of all issues with the highest predicted gain per cost until it is exhausted (0 to disable)'],
+			['-u', '--cpu_budget', False, False, None, 'store_true', 'Count the cpu seconds of the workers against --budget instead of wall-clock seconds'],
+			['-l', '--lines', False, False, None, 'store_true', 'Only recognize the lines of a block whose original ocr looks bad and keep the original text of all other lines'],
+			['-n', '--page_lines', False, False, None, 'store_true', 'Use the line coordinates of the page JSON instead of segmenting blocks (segmentation only if they are missing or inconsistent)'],
+			['-i', '--triage', False, False, None, 'store_true', 'Drop blank, noise, picture and rotated blocks with a fast check of their image before binarization']
 		],
 		'func': 'enhance',
+	},
+
+	'merge': {
+		'args': [
+			['-d', '--directory', True, None, readable_folder, 'store', 'Path to directory containing all issues enhanced with the sparse option']
+		],
+		'func': 'merge',
+	},
+
+	'epr-scan': {
+		'args': [
+			['-d', '--directory', True, None, readable_folder, 'store', 'Path to directory containing all orignal issues along with pages'],
+			['-o', '--output', False, None, str, 'store', 'Path to the CSV score table (compressed if ending in .gz or .bz2), defaults to epr-scan.csv inside the directory'],
+			['-w', '--workers', False, 1, int, 'store', 'Number of worker processes, each scanning whole issues'],
+			['-k', '--cache', False, None, str, 'store', 'Directory of the persistent epr feature store (shared with enhance --cache), reused by later scans'],
+			['-v', '--word_cache', False, False, None, 'store_true', 'Keep the spell checks of the dictionary scores in a word cache inside the --cache directory, shared by later scans and workers']
+		],
+		'func': 'epr_scan',
 	}
 }
\ No newline at end of file
@@ -7,6 +7,8 @@ import json
 import os
 import json
 import requests
+import constants.constants as ct
+from enhance.storage import dump_json, is_jsonl_file, is_page_file, load_json, open_text, strip_extension
 from typing import Tuple
 
 
@@ -127,6 +129,10 @@ def extract_pages(jsonl_path: str) -> None:
     Returns:
         None
 
+    Note:
+        The page files are written with the extension ct.PAGE_EXTENSION ('.json', '.json.gz' or '.json.bz2'),
+        which determines their codec, and without indentation if ct.COMPACT_JSON is set.
+
     Example:
         >>> extract_pages('/path/to/pages.jsonl')
     """
@@ -134,17 +140,15 @@ def extract_pages(jsonl_path: str) -> None:
     # Ensure the directory exists, create it if it doesn't
     try:
         print("Extracting all pages from pages.jsonl .....")
-        with open(jsonl_path, "r") as f:
-            records = [json.loads(line) for line in f]
-
-        for record in records:
-            record_id = record.get("id", "unknown_id")
+        with open_text(jsonl_path, "r") as f:
+            for line in f:
+                record = json.loads(line)
+                record_id = record.get("id", "unknown_id")
 
-            output_file_path = f"{directory_path}/{record_id}.json"
-            os.makedirs(os.path.dirname(output_file_path), exist_ok=True)
+                output_file_path = f"{directory_path}/{record_id}{ct.PAGE_EXTENSION}"
+                os.makedirs(os.path.dirname(output_file_path), exist_ok=True)
 
-            with open(output_file_path, "w") as f_out:
-                json.dump(record, f_out, indent=2)
+                dump_json(record, output_file_path)
 
         print(
             f"SUCCESS: Required pages extracted from JSONL and successfully saved as individual JSON files to : {directory_path}"
@@ -207,13 +211,16 @@ def extract_issues(
     )
 
 
-def download_images(pages_directory: str, images_directory: str) -> None:
+def download_images(
+    pages_directory: str, images_directory: str, from_jsonl: bool = False
+) -> None:
     """
     Downloads IIIF images corresponding to pages from JSON files inside the given directory.
 
     Args:
         pages_directory (str): Path to the directory containing JSON files with IIIF links.
         images_directory (str): Directory to save the downloaded images.
+        from_jsonl (bool): Read the IIIF links from the page records of the JSONL files instead.
 
     Returns:
         None
@@ -223,24 +230,29 @@ def download_images(pages_directory: str, images_directory: str) -> None:
     """
     # Iterate through all JSON files inside pages/
     print("\nExtracting required IIIF Images corresponding to the pages .....")
-    for filename in os.listdir(pages_directory):
-        if filename.endswith(".json"):
-            json_file_path = os.path.join(pages_directory, filename)
-
+    for filename in sorted(os.listdir(pages_directory)):
+        json_file_path = os.path.join(pages_directory, filename)
+        records = list()
+        if from_jsonl and is_jsonl_file(filename):
+            with open_text(json_file_path, "r") as jsonl_file:
+                for line in jsonl_file:
+                    record = json.loads(line)
+                    records.append((record.get("id", "unknown_id"), record.get("iiif")))
+        elif not from_jsonl and is_page_file(filename):
             # Extract "iiif" link from the JSON file
-            with open(json_file_path, "r", encoding="utf-8") as json_file:
-                data = json.load(json_file)
-                iiif_link = data.get("iiif")
+            data = load_json(json_file_path)
+            records.append((strip_extension(filename), data.get("iiif")))
 
-                # If iiif link is present, download and save the image
-                if iiif_link:
-                    image_url = iiif_link + "/full/full/0/default.png"
-                    image_filename = os.path.splitext(filename)[0] + ".png"
-                    print(f"downloading {image_url} .....")
-                    image_path = os.path.join(images_directory, image_filename)
+        for page_id, iiif_link in records:
+            # If iiif link is present, download and save the image
+            if iiif_link:
+                image_url = iiif_link + "/full/full/0/default.png"
+                image_filename = page_id + ".png"
+                print(f"downloading {image_url} .....")
+                image_path = os.path.join(images_directory, image_filename)
 
-                    # Download and save the image
-                    download_image(image_url, image_path)
+                # Download and save the image
+                download_image(image_url, image_path)
 
     print(f"SUCCESS: All images downloaded")
 
@@ -271,12 +283,13 @@ def download_image(url: str, save_path: str) -> None:
         print(f"Error downloading image: {e}")
 
 
-def prepare_data(config_file_path: str) -> str:
+def prepare_data(config_file_path: str, extract: bool = True) -> str:
     """
     Download data from an S3 bucket based on the information provided in the configuration file.
 
     Args:
         config_file_path (str): Path to the configuration file.
+        extract (bool): Extract the pages JSONL into single page JSON files (not needed to stream the JSONL).
 
     Returns:
         str: Local directory where the downloaded data is stored.
@@ -307,7 +320,8 @@ def prepare_data(config_file_path: str) -> str:
         local_directory,
         config_file_path,
     )
-    extract_pages(pages_path)
+    if extract:
+        extract_pages(pages_path)
     extract_issues(issues_path, newspaper_name, year, month, date, issue_version)
 
     pages_local_path = os.path.dirname(pages_path)
@@ -316,5 +330,5 @@ def prepare_data(config_file_path: str) -> str:
     if not os.path.exists(images_local_path):
         os.makedirs(images_local_path)
 
-    download_images(pages_local_path, images_local_path)
+    download_images(pages_local_path, images_local_path, from_jsonl=not extract)
     return local_directory
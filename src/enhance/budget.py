@@ -0,0 +1,126 @@
+from enhance.pages_improve import find_issues, incomplete_issue, load_enhance_models
+from enhance.page_parser import Block
+from enhance.cost_model import estimate_cost
+from enhance.epr_store import spell_counts, spell_info
+from enhance.scheduler import expand_issues, run_tasks
+import time
+from typing import List
+
+
+# predicted gain of running ocr on a block: enhancement prediction weighted by the number of characters of the block
+def predicted_gain(block: Block) -> float:
+    enhance = 1.0 if block.enhance == None else max(0.0, float(block.enhance))
+    return enhance * len(block.ocr_ori)
+
+
+# orders block indices by predicted gain per estimated cost, highest first
+def rank_blocks(blocks: List[Block]) -> List[int]:
+    return sorted(
+        range(len(blocks)),
+        key=lambda i: predicted_gain(blocks[i]) / estimate_cost(blocks[i].cost_features),
+        reverse=True,
+    )
+
+
+def improve_budget(
+    issues_directory: str,
+    required_epr: float,
+    workers: int,
+    budget: float,
+    cpu: bool = False,
+    force: bool = False,
+    sparse: bool = False,
+) -> None:
+    """
+    Enhances the blocks of all issues in the specified directory that promise the most improvement for a compute budget.
+
+    Args:
+            issues_directory (str): Path to the directory containing the issues to be enhanced.
+            required_epr (float): Enhancement prediction threshold, blocks below are not considered at all.
+            workers (int): Number of worker processes.
+            budget (float): Budget of the ocr phase in seconds.
+            cpu (bool): Count the cpu seconds spent by the workers on blocks instead of wall-clock seconds.
+            force (bool): Ignore the run manifests of previous runs and reprocess all pages.
+            sparse (bool): Write one sidecar per issue with the new ocr results instead of full copies of the pages.
+
+    Returns:
+            None: The function does not return a value but saves enhanced results in a new directory.
+
+    Note:
+            Runs in two phases. First, the enhancement prediction is computed for every block of all issues
+            (see "expand_issues"). Then, all blocks are ranked by predicted gain (enhancement prediction times number
+            of characters) per estimated cost (see "estimate_cost") and processed in this order by the workers (see
+            "run_tasks") until the budget is exhausted. Blocks that are already running finish, the remaining blocks
+            are skipped. Pages with skipped blocks are not recorded as completed in the run manifests, so that a
+            later run processes them again. The share of the total predicted gain that was captured is reported.
+
+    Example:
+            >>> improve_budget('/path/to/issues', 0.0, 8, 4 * 3600, cpu=True)
+    """
+    issues_paths = find_issues(issues_directory)
+
+    # phase one: enhancement prediction of all blocks, ocr models are loaded by the workers
+    models, features, required_epr = load_enhance_models(required_epr, False)
+    tasks, issues = expand_issues(
+        issues_paths, models, features, required_epr, force, sparse
+    )
+    ranked = rank_blocks([task[4] for task in tasks])
+    print(
+        "expanded "
+        + str(len(issues_paths))
+        + " issues into "
+        + str(len(tasks))
+        + " block tasks, ranked by predicted gain per cost"
+        + spell_info(spell_counts(features))
+    )
+
+    # phase two: ocr in order of the ranking until the budget is exhausted
+    before = time.time()
+    spent_seconds = [0.0]
+
+    def spent(seconds: float) -> bool:
+        if cpu:
+            spent_seconds[0] += seconds
+        else:
+            spent_seconds[0] = time.time() - before
+        return spent_seconds[0] >= budget
+
+    done = set()
+    if budget > 0 and len(tasks) > 0:
+        done = run_tasks(tasks, issues, [ranked], max(1, workers), spent)
+
+    total_gain = 0.0
+    captured_gain = 0.0
+    processed = 0
+    for task_index in ranked:
+        issue_path, page_id, _, _, block = tasks[task_index]
+        gain = predicted_gain(block)
+        total_gain += gain
+        if task_index in done:
+            if block.ocr != None:
+                captured_gain += gain
+                processed += 1
+        else:
+            issues[issue_path].finish_block(page_id, False, skipped=True)
+
+    # issues with blocks that were never processed (all workers failed or crashed)
+    for issue in issues.values():
+        if len(issue.outstanding) > 0:
+            incomplete_issue(issue.issue_path)
+
+    share = 100.0 if total_gain == 0 else 100.0 * captured_gain / total_gain
+    print(
+        "\n budget: "
+        + str(round(spent_seconds[0], 1))
+        + "/"
+        + str(budget)
+        + (" cpu" if cpu else " wall-clock")
+        + " seconds, new ocr for "
+        + str(processed)
+        + "/"
+        + str(len(tasks))
+        + " blocks, "
+        + str(round(share, 1))
+        + "% of the predicted gain captured"
+    )
+    print("\n Enhancements for all the issues completed")
@@ -0,0 +1,241 @@
+import constants.constants as ct
+import os
+import json
+import numpy as np
+from typing import Any, Dict, List, Optional, Tuple
+
+# folder of the cost model and the recorded timings, next to the other models
+COST_MODEL_FOLDER = "cost/"
+
+# file names of the calibrated cost model and of the recorded block timings
+COST_MODEL_NAME = "cost_model.json"
+COST_TIMINGS_NAME = "cost_timings.jsonl"
+
+# only the most recent timings are used for calibration (and kept)
+MAX_TIMINGS = 20000
+
+# minimum number of timings required for calibration
+MIN_TIMINGS = 20
+
+# number of weights of the cost model (see "feature_vector")
+COST_FEATURES = 4
+
+# weights of the cost model used until one is calibrated: one second per megapixel of block area
+DEFAULT_COST_WEIGHTS = [0.0, 1.0, 0.0, 0.0]
+
+# lower bound of every estimate in seconds
+MIN_COST = 0.001
+
+# cost model of the current process, loaded on first use
+cost_models = dict()
+
+
+def block_features(region: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Returns the features of a region that are available before ocr and determine its ocr runtime.
+
+    Args:
+            region (Dict[str, Any]): Region of a page JSON.
+
+    Returns:
+            Dict[str, Any]: 'area' of the region in megapixels (from 'c') and number of 'lines' and 'tokens' of
+            the original ocr (from the 'l' and 't' entries of its paragraphs).
+
+    Note:
+            The font of the block is not known before ocr: the original page JSON doesn't hold it and the ocr cache
+            is keyed by the pixels of the block crop, which is not decoded yet.
+
+    Example:
+            >>> block_features(page.regions['NZG-1881-10-01-a-i0030-block_1'])
+            {'area': 1.93, 'lines': 61, 'tokens': 412}
+    """
+    coordinates = region.get("c") or [0, 0, 0, 0]
+    lines = 0
+    tokens = 0
+    for para_info in region.get("p", []):
+        for line_info in para_info.get("l", []):
+            lines += 1
+            tokens += len(line_info.get("t", []))
+    return {
+        "area": coordinates[2] * coordinates[3] / 1e6,
+        "lines": lines,
+        "tokens": tokens,
+    }
+
+
+# feature vector of a block: intercept, area, lines and tokens
+def feature_vector(features: Dict[str, Any]) -> List[float]:
+    return [1.0, features["area"], features["lines"], features["tokens"]]
+
+
+class CostModel:
+    """
+    Linear model of the ocr runtime of a block (binarization, segmentation, font and character recognition).
+
+    Attributes:
+            weights (List[float]): Seconds per feature (intercept, area, lines, tokens).
+            samples (int): Number of timings the model was calibrated on.
+            error (float): Mean absolute error of the calibrated model on its timings in seconds.
+    """
+
+    def __init__(self, weights: List[float], samples: int = 0, error: float = 0.0):
+        self.weights = weights
+        self.samples = samples
+        self.error = error
+
+    # estimated ocr runtime of a block in seconds
+    def estimate(self, features: Dict[str, Any]) -> float:
+        x = feature_vector(features)
+        return max(MIN_COST, float(np.dot(self.weights, x)))
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as model_file:
+            json.dump(
+                {
+                    "weights": self.weights,
+                    "samples": self.samples,
+                    "error": self.error,
+                },
+                model_file,
+                indent=2,
+            )
+        os.replace(temp_path, path)
+
+    @staticmethod
+    def load(path: str) -> Optional["CostModel"]:
+        if not os.path.isfile(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as model_file:
+                data = json.load(model_file)
+            if len(data["weights"]) != COST_FEATURES:
+                raise ValueError("unexpected number of weights")
+            return CostModel(data["weights"], data["samples"], data["error"])
+        except (OSError, ValueError, KeyError):
+            print("ignoring unreadable cost model " + path)
+            return None
+
+
+def fit_cost_model(timings: List[Tuple[Dict[str, Any], float]]) -> CostModel:
+    """
+    Fits a cost model to recorded timings by least squares.
+
+    Args:
+            timings (List[Tuple[Dict[str, Any], float]]): Features of blocks (see "block_features") and their
+                    measured ocr runtime in seconds.
+
+    Returns:
+            CostModel: The fitted model.
+    """
+    x = np.array([feature_vector(features) for features, _ in timings])
+    y = np.array([seconds for _, seconds in timings])
+    weights = np.linalg.lstsq(x, y, rcond=None)[0]
+    error = float(np.mean(np.abs(np.maximum(x @ weights, MIN_COST) - y)))
+    return CostModel([float(w) for w in weights], len(timings), error)
+
+
+def calibrate_cost_model() -> Optional[CostModel]:
+    """
+    Calibrates the cost model on the timings recorded by previous runs and saves it next to the other models.
+
+    Returns:
+            Optional[CostModel]: The calibrated model, None if fewer than MIN_TIMINGS timings were recorded.
+
+    Note:
+            Timings are recorded by the block-granular runs (see "record_timings"), the model is stored in
+            models/cost/cost_model.json. Only the MAX_TIMINGS most recent timings are used.
+    """
+    path = ct.MODELS_PATH + COST_MODEL_FOLDER + COST_TIMINGS_NAME
+    if not os.path.isfile(path):
+        return None
+    timings = list()
+    with open(path, "r", encoding="utf-8") as timings_file:
+        for line in timings_file:
+            try:
+                record = json.loads(line)
+                timings.append((record["features"], record["seconds"]))
+            except (ValueError, KeyError):
+                continue
+    timings = timings[-MAX_TIMINGS:]
+    if len(timings) < MIN_TIMINGS:
+        return None
+    model = fit_cost_model(timings)
+    model.save(ct.MODELS_PATH + COST_MODEL_FOLDER + COST_MODEL_NAME)
+    cost_models["cost"] = model
+    return model
+
+
+def record_timings(timings: List[Tuple[Dict[str, Any], float]]) -> None:
+    """
+    Appends the measured ocr runtimes of blocks to the recorded timings and recalibrates the cost model.
+
+    Args:
+            timings (List[Tuple[Dict[str, Any], float]]): Features of blocks (see "block_features") and their
+                    measured ocr runtime in seconds.
+
+    Returns:
+            None
+
+    Note:
+            Blocks whose ocr results were taken from the ocr cache must not be recorded. The timings file is
+            trimmed to the MAX_TIMINGS most recent timings once it holds twice as many. Every call reads the whole
+            timings file again to recalibrate the model (see "calibrate_cost_model"), so the timings of a run are
+            recorded at once by its end (see "run_tasks").
+    """
+    if len(timings) == 0:
+        return
+    directory = ct.MODELS_PATH + COST_MODEL_FOLDER
+    path = directory + COST_TIMINGS_NAME
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with open(path, "a", encoding="utf-8") as timings_file:
+            for features, seconds in timings:
+                timings_file.write(json.dumps({"features": features, "seconds": seconds}) + "\n")
+        with open(path, "r", encoding="utf-8") as timings_file:
+            lines = timings_file.readlines()
+        if len(lines) > 2 * MAX_TIMINGS:
+            with open(path + ".tmp", "w", encoding="utf-8") as timings_file:
+                timings_file.writelines(lines[-MAX_TIMINGS:])
+            os.replace(path + ".tmp", path)
+    except OSError as e:
+        print("couldn't record block timings in " + path + ": " + str(e))
+        return
+    model = calibrate_cost_model()
+    if model != None:
+        print(
+            "calibrated cost model on "
+            + str(model.samples)
+            + " block timings (mean absolute error "
+            + str(round(model.error, 3))
+            + " s)"
+        )
+
+
+def estimate_cost(features: Dict[str, Any]) -> float:
+    """
+    Estimates the ocr runtime of a block before running it.
+
+    Args:
+            features (Dict[str, Any]): Features of the block (see "block_features"), stored as 'cost_features' in
+                    the blocks prepared by "process_pages_file".
+
+    Returns:
+            float: Estimated runtime in seconds.
+
+    Note:
+            As long as no cost model has been calibrated, a default model taking one second per megapixel of block
+            area is used (DEFAULT_COST_WEIGHTS). Its estimates are in seconds as well, but far less accurate.
+
+    Example:
+            >>> estimate_cost(block.cost_features)
+            0.84
+    """
+    if "cost" not in cost_models:
+        cost_models["cost"] = CostModel.load(
+            ct.MODELS_PATH + COST_MODEL_FOLDER + COST_MODEL_NAME
+        )
+        if cost_models["cost"] == None:
+            cost_models["cost"] = CostModel(DEFAULT_COST_WEIGHTS)
+    return cost_models["cost"].estimate(features)
@@ -0,0 +1,230 @@
+import constants.constants as ct
+import os
+import csv
+import time
+import traceback
+import multiprocessing
+import numpy as np
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from enhance.issue_parser import (
+    filter_item_types,
+    find_issues,
+    load_item_types,
+    removed_types_info,
+)
+from enhance.page_model import Page, read_pages_jsonl
+from enhance.epr_store import get_feature_store, page_features, spell_counts, spell_info
+from enhance.storage import is_jsonl_file, is_page_file, open_text
+from epr.features_epr import Features
+from epr.knn_epr import find_epr_model, predict_batch, read_epr_model
+
+# columns of the score table, one row per block
+SCAN_COLUMNS = [
+    "issue",
+    "page",
+    "block",
+    "chars",
+    "dict",
+    "ngram",
+    "garbage",
+    "year",
+    "epr",
+]
+
+# number of bins of the histogram over the range of enhancement predictions [-1, 1]
+HISTOGRAM_BINS = 20
+
+# width of the longest bar of the histogram in characters
+HISTOGRAM_WIDTH = 40
+
+# features and epr model of a scan worker process, loaded once by "init_scan_worker"
+worker_state = dict()
+
+
+def init_scan_worker(model_path: str) -> None:
+    features = Features()
+    model = read_epr_model(model_path)
+    worker_state["features"] = features
+    worker_state["model"] = model
+
+
+# original pages of an issue, from single page files or, if there are none, from the pages JSONL files
+def issue_pages(issue_path: str) -> Iterator[Page]:
+    pages_directory = os.path.join(os.path.dirname(issue_path), "pages")
+    page_files = [f for f in sorted(os.listdir(pages_directory)) if is_page_file(f)]
+    if len(page_files) > 0:
+        for f in page_files:
+            yield Page(os.path.join(pages_directory, f))
+    else:
+        for f in sorted(os.listdir(pages_directory)):
+            if is_jsonl_file(f):
+                yield from read_pages_jsonl(os.path.join(pages_directory, f))
+
+
+def scan_issue(
+    issue_path: str,
+) -> Tuple[str, List[List[Any]], Optional[str], int, Dict[str, int], List[int]]:
+    """
+    Computes the enhancement prediction of every region of an issue from its original text only.
+
+    Args:
+            issue_path (str): Path to the issue file.
+
+    Returns:
+            Tuple[str, List[List[Any]], Optional[str], int, Dict[str, int], List[int]]: The issue path, one row per
+            block (see SCAN_COLUMNS), the error message if the issue couldn't be scanned (None otherwise), the number
+            of blocks whose features were taken from the feature store, the number of blocks removed per content
+            item type (see "filter_item_types") and the spell checks of the issue (see "spell_counts").
+
+    Note:
+            Runs inside a scan worker (see "init_scan_worker"). The features are computed as by
+            "process_pages_file" or taken from the feature store (see "page_features"), the predictions of all
+            blocks of the issue are computed in one batch.
+    """
+    features = worker_state["features"]
+    model = worker_state["model"]
+    issue_id = os.path.basename(os.path.dirname(issue_path))
+    store = get_feature_store()
+    hits = 0 if store == None else store.hits
+    removed_types = dict()
+    spelled = spell_counts(features)
+    try:
+        item_types = load_item_types(issue_path)
+        rows = list()
+        x = list()
+        for page in issue_pages(issue_path):
+            filter_item_types(page, item_types, removed_types)
+            x_values = page_features(
+                page,
+                features,
+                model["trigrams"],
+                lambda trigrams, lang: features.get_ranked_ngram_score(
+                    trigrams, model["ranks"][lang]
+                ),
+            )
+            for block_name in page.regions:
+                x.append(x_values[block_name])
+                rows.append([issue_id, page.id, block_name, len(page.get_text(block_name))])
+        features.save_words()
+        if len(rows) > 0:
+            predictions = predict_batch(model, np.array(x), model["k"])
+            for row, x_row, prediction in zip(rows, x, predictions):
+                row.extend(x_row)
+                row.append(float(prediction))
+        hits = 0 if store == None else store.hits - hits
+        return issue_path, rows, None, hits, removed_types, spell_counts(features, spelled)
+    except Exception:
+        return issue_path, list(), traceback.format_exc(), 0, removed_types, spell_counts(features, spelled)
+
+
+def print_histogram(eprs: np.ndarray, chars: np.ndarray) -> None:
+    """
+    Prints the distribution of the enhancement predictions of the non-empty blocks.
+
+    Args:
+            eprs (np.ndarray): Enhancement prediction of every block.
+            chars (np.ndarray): Number of characters of every block.
+
+    Returns:
+            None
+
+    Note:
+            Every line covers one bin of predictions, its number of blocks and characters, a bar proportional
+            to the characters and the number of blocks and characters that '-r' set to the lower bound of the bin
+            would select.
+    """
+    non_empty = chars > 0
+    eprs = eprs[non_empty]
+    chars = chars[non_empty]
+    edges = np.linspace(-1.0, 1.0, HISTOGRAM_BINS + 1)
+    bins = np.clip(np.searchsorted(edges, eprs, side="right") - 1, 0, HISTOGRAM_BINS - 1)
+    bin_blocks = np.bincount(bins, minlength=HISTOGRAM_BINS)
+    bin_chars = np.bincount(bins, weights=chars, minlength=HISTOGRAM_BINS)
+    max_chars = max(1.0, bin_chars.max())
+
+    print("\n epr range        blocks       chars  " + " " * HISTOGRAM_WIDTH + "  blocks >= r   chars >= r")
+    for i in range(HISTOGRAM_BINS):
+        bar = "#" * int(round(HISTOGRAM_WIDTH * bin_chars[i] / max_chars))
+        print(
+            f" [{edges[i]:5.2f},{edges[i + 1]:5.2f})"
+            f" {bin_blocks[i]:10d} {int(bin_chars[i]):11d}  {bar:<{HISTOGRAM_WIDTH}}"
+            f" {int(bin_blocks[i:].sum()):12d} {int(bin_chars[i:].sum()):12d}"
+        )
+
+
+def scan_issues(issues_directory: str, output_path: str, workers: int = 1) -> None:
+    """
+    Computes the enhancement prediction of every block of all issues without images or ocr models and writes
+    a score table.
+
+    Args:
+            issues_directory (str): Path to the directory containing the issues to be scanned.
+            output_path (str): Path to the CSV score table, compressed if it ends in '.gz' or '.bz2'.
+            workers (int): Number of worker processes, each scanning whole issues.
+
+    Returns:
+            None
+
+    Note:
+            Only the epr model stored in models/final/ and the dictionaries are loaded, neither tensorflow nor
+            kraken. Regions of content items that are not of a target type are skipped, as by "enhance". With a
+            cache directory (ct.CACHE_PATH), features are kept in the feature store, so that later scans only run
+            the prediction. Page JSON files (or pages JSONL files) are streamed one issue at a time, the rows of
+            the table are written in the order of the issues. With the word cache (ct.WORD_CACHE), the spell checks
+            of the dictionary scores are shared by the workers and later scans (see "WordCache"). A histogram of the
+            predictions (see "print_histogram") is printed at the end.
+
+    Example:
+            >>> scan_issues('/path/to/issues', '/path/to/epr-scan.csv.gz', 8)
+    """
+    model_path = find_epr_model()
+    if model_path == None:
+        print("no epr model found in " + ct.MODELS_PATH + "final/, epr-scan requires one")
+        return
+    issues_paths = find_issues(issues_directory)
+
+    before = time.time()
+    eprs = list()
+    chars = list()
+    stored_blocks = 0
+    removed_types = dict()
+    spelled = [0, 0, 0, 0]
+    ctx = multiprocessing.get_context("fork")
+    with ctx.Pool(max(1, workers), init_scan_worker, (model_path,)) as pool:
+        with open_text(output_path, "w") as output_file:
+            writer = csv.writer(output_file)
+            writer.writerow(SCAN_COLUMNS)
+            for issue_path, rows, error, hits, removed, spell_checks in pool.imap(
+                scan_issue, issues_paths
+            ):
+                spelled = [count + new for count, new in zip(spelled, spell_checks)]
+                if error != None:
+                    print("couldn't scan issue " + issue_path + "\n" + error)
+                    continue
+                stored_blocks += hits
+                for item_type, n_removed in removed.items():
+                    removed_types[item_type] = removed_types.get(item_type, 0) + n_removed
+                writer.writerows(rows)
+                for row in rows:
+                    chars.append(row[3])
+                    eprs.append(row[-1])
+
+    seconds = max(time.time() - before, 1e-6)
+    print(
+        "scanned "
+        + str(len(eprs))
+        + " blocks of "
+        + str(len(issues_paths))
+        + " issues in "
+        + str(round(seconds, 1))
+        + " s ("
+        + str(int(len(eprs) / seconds))
+        + " blocks/s, features of "
+        + str(stored_blocks)
+        + " blocks from the feature store"
+        + removed_types_info(removed_types)
+        + spell_info(spelled)
+        + "), score table written to "
+        + output_path
+    )
+    print_histogram(np.array(eprs, dtype=float), np.array(chars, dtype=float))
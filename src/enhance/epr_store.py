@@ -0,0 +1,223 @@
+import constants.constants as ct
+import os
+import json
+import hashlib
+from typing import Any, Callable, Dict, List, Optional
+from enhance.page_model import Page
+from ocr.pipe.sqlite_store import SqliteStore
+
+# name of the sqlite database inside the cache directory
+EPR_STORE_NAME = "epr.sqlite"
+
+# fingerprints of the feature extraction, computed once per process and set of trigram lists
+fingerprints = dict()
+
+
+class FeatureStore(SqliteStore):
+    """
+    Persistent store of the enhancement prediction features of regions, keyed by page ID and region index.
+
+    Attributes:
+            hits (int): Number of regions whose features were taken from the store.
+            lookups (int): Number of regions looked up.
+
+    Note:
+            Every region holds the sha1 hash of its original text and the fingerprint of the feature extraction
+            (see "features_fingerprint"), stored features are only used if both are unchanged. Connections and
+            locking are those of all persistent caches (see "SqliteStore").
+    """
+
+    def __init__(self, directory: str):
+        super().__init__(
+            os.path.join(directory, EPR_STORE_NAME),
+            [
+                "CREATE TABLE IF NOT EXISTS features (page TEXT, region INTEGER, text TEXT, fingerprint TEXT, "
+                "x TEXT, PRIMARY KEY (page, region))"
+            ],
+        )
+        self.hits = 0
+        self.lookups = 0
+
+    # returns the stored features of the regions of a page as region index -> (text hash, features)
+    def load_page(self, page_id: str, fingerprint: str) -> Dict[int, Any]:
+        with self.lock:
+            rows = self.connect().execute(
+                "SELECT region, text, x FROM features WHERE page = ? AND fingerprint = ?",
+                (page_id, fingerprint),
+            )
+            return {region: (text, json.loads(x)) for region, text, x in rows}
+
+    # stores the features of regions of a page, given as (region index, text hash, features)
+    def save_page(self, page_id: str, fingerprint: str, entries: List[Any]) -> None:
+        with self.lock:
+            connection = self.connect()
+            connection.executemany(
+                "INSERT OR REPLACE INTO features VALUES (?, ?, ?, ?, ?)",
+                [
+                    (page_id, region, text, fingerprint, json.dumps(x))
+                    for region, text, x in entries
+                ],
+            )
+            connection.commit()
+
+
+# stores of the current process, opened on first use
+stores = dict()
+
+
+# returns the feature store inside ct.CACHE_PATH, None if caching is disabled
+def get_feature_store() -> Optional[FeatureStore]:
+    if ct.CACHE_PATH == None:
+        return None
+    if ct.CACHE_PATH not in stores:
+        stores[ct.CACHE_PATH] = FeatureStore(ct.CACHE_PATH)
+    return stores[ct.CACHE_PATH]
+
+
+def features_fingerprint(trigrams: Dict[str, List[str]]) -> str:
+    """
+    Returns a fingerprint of everything the enhancement prediction features of a text depend on.
+
+    Args:
+            trigrams (Dict[str, List[str]]): Trigram lists per language of the epr model.
+
+    Returns:
+            str: sha1 hash over the trigram lists, the dictionary files (names, sizes and modification times)
+            and the parameters of the garbage score, tokenization and year scaling.
+
+    Note:
+            The training blocks and k of the epr model are not included, so that the stored features remain valid
+            for another epr model with the same trigram lists, only the prediction is run again.
+    """
+    key = id(trigrams)
+    if key not in fingerprints:
+        dict_files = list()
+        for root, _, files in sorted(os.walk(ct.DICTS_PATH)):
+            for f in sorted(files):
+                stat = os.stat(os.path.join(root, f))
+                dict_files.append([f, stat.st_size, stat.st_mtime_ns])
+        params = [
+            ct.EPR_RULE1,
+            ct.EPR_RULE2,
+            ct.EPR_RULE3,
+            ct.EPR_RULE4,
+            ct.EPR_RULE5,
+            ct.EPR_RULE9,
+            ct.NGRAM_LENGTH,
+            ct.MIN_YEAR,
+            ct.MAX_YEAR,
+            sorted(ct.VOWELS),
+            sorted(ct.HYPHENS),
+            sorted(ct.SUPPORTED_LANGS),
+        ]
+        sha1 = hashlib.sha1()
+        sha1.update(json.dumps([trigrams, dict_files, params], sort_keys=True).encode("utf-8"))
+        fingerprints[key] = (trigrams, sha1.hexdigest())
+    return fingerprints[key][1]
+
+
+# spell checks of the features since the counts before (see "Features.spell_counts"), none without features
+def spell_counts(features: Any, before: Optional[List[int]] = None) -> List[int]:
+    if features == None:
+        return [0, 0, 0, 0]
+    counts = features.spell_counts()
+    if before == None:
+        return counts
+    return [count - previous for count, previous in zip(counts, before)]
+
+
+# summary information about spell checks given by "spell_counts": share answered from memory and, with the word cache,
+# share of the others answered by the word cache
+def spell_info(counts: List[int]) -> str:
+    lookups, hits, cache_lookups, cache_hits = counts
+    if lookups == 0:
+        return ""
+    info = ", " + str(lookups) + " spell checks (" + str(round(100.0 * hits / lookups, 1)) + "% from memory"
+    if cache_lookups > 0:
+        info += ", " + str(round(100.0 * cache_hits / cache_lookups, 1)) + "% of the others from the word cache"
+    return info + ")"
+
+
+# enhancement prediction features of original texts: dictionary score, trigram score, garbage score and scaled year,
+# the garbage scores of all texts are computed at once (see "get_garbage_scores")
+def epr_features(
+    features: Any, texts: List[str], year: int, ngram_score: Callable[[List[str], str], float]
+) -> List[List[float]]:
+    token_lists = [features.get_tokens(text) for text in texts]
+    garbage_scores = features.get_garbage_scores(token_lists)
+    lang = "de"  # assuming german text
+    return [
+        [
+            features.get_dict_score(tokens, lang),
+            ngram_score(features.get_trigrams(tokens), lang),
+            garbage_score,
+            features.scale_year(year),
+        ]
+        for tokens, garbage_score in zip(token_lists, garbage_scores)
+    ]
+
+
+def page_features(
+    page: Page,
+    features: Any,
+    trigrams: Dict[str, List[str]],
+    ngram_score: Callable[[List[str], str], float],
+) -> Dict[str, List[float]]:
+    """
+    Returns the enhancement prediction features of all regions of a page, taking them from the feature store if possible.
+
+    Args:
+            page (Page): Page model.
+            features (Features): Object computing the features.
+            trigrams (Dict[str, List[str]]): Trigram lists per language of the epr model.
+            ngram_score (Callable[[List[str], str], float]): Returns the trigram score of a list of trigrams of a language.
+
+    Returns:
+            Dict[str, List[float]]: Features (dictionary score, trigram score, garbage score, scaled year) per block name.
+
+    Note:
+            Without cache directory (ct.CACHE_PATH), all features are computed. Otherwise only the features of
+            regions that are not stored yet, or whose original text or feature extraction changed, are computed
+            and then stored. The features of the page are computed in one batch (see "epr_features").
+
+    Example:
+            >>> page_features(page, features, models.epr['trigrams'], score)['NZG-1881-10-01-a-i0030-block_1']
+            [0.371, 0.614, 0.0, 0.342]
+    """
+    store = get_feature_store()
+    stored = dict()
+    fingerprint = None
+    if store != None:
+        fingerprint = features_fingerprint(trigrams)
+        stored = store.load_page(page.id, fingerprint)
+
+    # index of every region in the page JSON, unaffected by regions removed from page.regions
+    region_indices = {id(region): i for i, region in enumerate(page.data.get("r", []))}
+    x_values = dict()
+    computed = list()
+    for block_name in page.regions:
+        region = region_indices[id(page.regions[block_name])]
+        text = page.get_text(block_name)
+        if store == None:
+            computed.append((block_name, region, None, text))
+            continue
+        text_hash = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        store.lookups += 1
+        if region in stored and stored[region][0] == text_hash:
+            store.hits += 1
+            x_values[block_name] = stored[region][1]
+        else:
+            computed.append((block_name, region, text_hash, text))
+
+    # the features of all blocks that were not stored are computed at once
+    new_entries = list()
+    computed_x = epr_features(
+        features, [entry[3] for entry in computed], page.year, ngram_score
+    )
+    for (block_name, region, text_hash, _), x in zip(computed, computed_x):
+        x_values[block_name] = x
+        if store != None:
+            new_entries.append((region, text_hash, x))
+    if len(new_entries) > 0:
+        store.save_page(page.id, fingerprint, new_entries)
+    return x_values
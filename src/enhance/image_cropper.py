@@ -1,7 +1,109 @@
 import constants.constants as ct
 import cv2
-from typing import Dict, Optional
+import numpy as np
+from PIL import Image
+from typing import Dict, Optional, Tuple
 from enhance.page_parser import Block
+from enhance.raster_cache import load_raster
+
+# color modes of PNG files that can be decoded partially and converted to single-channel 8-bit images
+TRUNCATABLE_MODES = ("1", "L", "LA", "P", "RGB", "RGBA")
+
+# weights of red, green and blue (15-bit fixed point) used by libpng to convert color PNG files to grayscale for
+# cv2.imread(..., cv2.IMREAD_GRAYSCALE): 0.299 and 0.587 rounded down, blue taking the rest
+GRAY_WEIGHTS = np.array([9797, 19234, 3737], dtype=np.uint32)
+
+# partial decoding (Pillow) is slower per row than cv2.imread and only used below this fraction of the image height
+PARTIAL_DECODE_RATIO = 0.75
+
+
+# converts a decoded PNG image (Pillow) to the single-channel 8-bit image returned by cv2.imread for the same file
+def to_gray(pil_image: Image.Image) -> np.ndarray:
+    if pil_image.mode == "P":
+        pil_image = pil_image.convert(
+            "RGBA" if "transparency" in pil_image.info else "RGB"
+        )
+    pixels = np.asarray(pil_image)
+    if pil_image.mode == "1":
+        return pixels.astype(np.uint8) * 255
+    if pil_image.mode == "L":
+        return pixels
+    if pil_image.mode == "LA":
+        return np.ascontiguousarray(pixels[:, :, 0])
+    # alpha is ignored, as by cv2.imread
+    return ((pixels[:, :, :3] * GRAY_WEIGHTS).sum(axis=2) >> 15).astype(np.uint8)
+
+
+# returns the number of image rows (from the top) that are needed to crop all blocks
+def needed_rows(blocks_stuff: Dict[str, Block]) -> int:
+    return max(
+        block.coordinates[1] + block.coordinates[3] for block in blocks_stuff.values()
+    )
+
+
+def read_rows(
+    image_path: str, rows: Optional[int] = None
+) -> Tuple[Optional[np.ndarray], int]:
+    """
+    Decodes the top rows of a page image, stopping after the last needed row.
+
+    Args:
+        image_path (str): Path to the image file.
+        rows (Optional[int]): Number of rows to decode, the whole image is decoded if None.
+
+    Returns:
+        Tuple[Optional[np.ndarray], int]: The decoded rows as single-channel 8-bit (grayscale) image, None if the
+        image can't be read, together with the height of the whole image.
+
+    Note:
+        PNG rows are stored from top to bottom, so that non-interlaced PNG files can be decoded partially by
+        limiting the extent of their data (Pillow). Other images, and images of which at least PARTIAL_DECODE_RATIO
+        of the rows are needed, are decoded entirely with cv2.imread. Pages are decoded to grayscale right away, as
+        binarization only works on a single channel, which takes a third of the memory of color images. Partially
+        decoded rows are converted like cv2.imread does (see "to_gray"), so that blocks get the same pixels (and ocr
+        cache keys) either way. Limiting the extent relies on attributes of Pillow that are not part of its API, the
+        whole image is decoded with cv2.imread if they don't behave as expected.
+        If the raster cache is enabled (ct.RASTER_CACHE_SIZE > 0), whole pages are taken from the cache or decoded
+        and added to it instead (see "load_raster").
+
+    Example:
+        >>> image, height = read_rows('/path/to/image.png', 1200)
+        >>> image.shape, height
+        ((1200, 4000), 6000)
+    """
+    if ct.CACHE_PATH != None and ct.RASTER_CACHE_SIZE > 0:
+        image = load_raster(image_path)
+        if image is None:
+            return None, 0
+        return image, len(image)
+
+    if rows != None:
+        try:
+            with Image.open(image_path) as pil_image:
+                width, height = pil_image.size
+                if (
+                    pil_image.format == "PNG"
+                    and len(pil_image.tile) == 1
+                    and pil_image.tile[0][0] == "zip"
+                    and not pil_image.info.get("interlace")
+                    and pil_image.mode in TRUNCATABLE_MODES
+                    and rows < height * PARTIAL_DECODE_RATIO
+                ):
+                    codec, _, offset, args = pil_image.tile[0]
+                    pil_image._size = (width, rows)
+                    pil_image.tile = [(codec, (0, 0, width, rows), offset, args)]
+                    pil_image.load()
+                    if pil_image.size == (width, rows):
+                        image = to_gray(pil_image)
+                        if image.shape == (rows, width):
+                            return image, height
+        except (OSError, AttributeError, TypeError, ValueError):
+            pass
+
+    image = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        return None, 0
+    return image, len(image)
 
 
 # crops all images from image file for a set of blocks related to the same page file
@@ -18,32 +120,62 @@ def get_images(
     Returns:
         Optional[Dict[str, Block]]: Updated dictionary containing information about text blocks with cropped images.
 
+    Note:
+        The image is not read at all if there is no block and is only decoded down to the lowest block otherwise
+        (see "read_rows"), pass only the blocks that will be processed.
+
     Example:
         >>> updated_blocks = get_images('/path/to/image.jpg', {'block_1': <Block object 1>, 'block_2': <Block object 2>})
         >>> print(updated_blocks)
         {'block_1': <Block object 1>, 'block_2': <Block object 2>, ...}
     """
-    image = cv2.imread(image_path)
-    if not image is None:
-        for block_id in blocks_stuff:
-            coords = blocks_stuff[block_id].coordinates
-            x = coords[0]
-            y = coords[1]
-            w = coords[2]
-            h = coords[3]
-            if x + w > (len(image[0]) + ct.IMG_CROP_TOLERANCE) or y + h > (
-                len(image) + ct.IMG_CROP_TOLERANCE
-            ):
-                print(
-                    "image coordinates for block "
-                    + block_id
-                    + " are out of bounds in image "
-                    + image_path
-                )
-                return
-            cropped_image = image[y : y + h, x : x + w]
-            blocks_stuff[block_id].image = cropped_image
-    else:
+    if len(blocks_stuff) == 0:
+        return blocks_stuff
+    image, height = read_rows(image_path, needed_rows(blocks_stuff))
+    if image is None:
         print("couldn't read image at " + image_path)
         return
+    return crop_blocks(image, image_path, blocks_stuff, height)
+
+
+# crops the images of a set of blocks from an already decoded page image
+def crop_blocks(
+    image: np.ndarray,
+    image_path: str,
+    blocks_stuff: Dict[str, Block],
+    image_height: Optional[int] = None,
+) -> Optional[Dict[str, Block]]:
+    """
+    Crop images for a set of blocks from an already decoded page image.
+
+    Args:
+        image (np.ndarray): Decoded page image (or its top rows, see "read_rows").
+        image_path (str): Path to the image file (used for error messages).
+        blocks_stuff (Dict[str, Block]): Dictionary containing information about text blocks.
+        image_height (Optional[int]): Height of the whole page image, defaults to the height of image.
+
+    Returns:
+        Optional[Dict[str, Block]]: Updated dictionary containing information about text blocks with cropped images,
+        None if the coordinates of a block are out of bounds.
+    """
+    if image_height == None:
+        image_height = len(image)
+    for block_id in blocks_stuff:
+        coords = blocks_stuff[block_id].coordinates
+        x = coords[0]
+        y = coords[1]
+        w = coords[2]
+        h = coords[3]
+        if x + w > (len(image[0]) + ct.IMG_CROP_TOLERANCE) or y + h > (
+            image_height + ct.IMG_CROP_TOLERANCE
+        ):
+            print(
+                "image coordinates for block "
+                + block_id
+                + " are out of bounds in image "
+                + image_path
+            )
+            return
+        cropped_image = image[y : y + h, x : x + w]
+        blocks_stuff[block_id].image = cropped_image
     return blocks_stuff
@@ -1,10 +1,11 @@
+import constants.constants as ct
 import os
-import json
-from collections import defaultdict
-from typing import Tuple, Dict, Optional
+from typing import Any, Tuple, Dict, List
+from enhance.page_model import Page
+from enhance.storage import is_page_file, load_json
 
 
-def parse_pages_structure(root_path: str) -> Tuple[Dict[str, Dict[str, Optional[str]]], int]:
+def parse_pages_structure(root_path: str) -> Tuple[Dict[str, Dict[str, Any]], int]:
     """
     Parses the structure of pages in an issue.
 
@@ -12,7 +13,7 @@ def parse_pages_structure(root_path: str) -> Tuple[Dict[str, Dict[str, Optional[
         root_path (str): The root path of the issue containing 'pages' and 'images' directories.
 
     Returns:
-        Tuple[Dict[str, Dict[str, Optional[str]]], int]:
+        Tuple[Dict[str, Dict[str, Any]], int]:
             A tuple containing:
                 - A dictionary with region information about each pages.
                 - The total number of blocks across all pages.
@@ -21,9 +22,10 @@ def parse_pages_structure(root_path: str) -> Tuple[Dict[str, Dict[str, Optional[
         Any exceptions raised during the parsing.
 
     Note:
-        This function takes the original path of the issue as input, parses each page of the issue,
-        extracts the 'pOf' IDs, and appends 'block_1', 'block_2', etc., depending on their frequency
-        inside each page. Image paths and page file paths are also extracted and stored in the dictionary.
+        This function takes the original path of the issue as input and parses each page file ('.json', '.json.gz' or '.json.bz2') of the issue
+        exactly once into a Page model, which extracts the 'pOf' IDs and appends 'block_1', 'block_2', etc.,
+        depending on their frequency inside each page. Image paths, page file paths and the page models are
+        stored in the dictionary, so that later stages never need to read the page files again.
         The function prepares the entire structure of all the pages and how many blocks are present inside each page.
 
     Example:
@@ -35,41 +37,102 @@ def parse_pages_structure(root_path: str) -> Tuple[Dict[str, Dict[str, Optional[
     # Dictionary to store information about each page
     pages_data = {}
 
-    # Dictionary to store the frequency of each unique ID
-    unique_id_frequency = defaultdict(int)
-
     total_blocks = 0
-    for pages_file_name in os.listdir(pages_directory):
-        if pages_file_name.endswith(".json"):
+    for pages_file_name in sorted(os.listdir(pages_directory)):
+        if is_page_file(pages_file_name):
             pages_file_path = os.path.join(pages_directory, pages_file_name)
+            page = Page(pages_file_path)
+            total_blocks += len(page.regions)
 
-            with open(pages_file_path, "r", encoding="utf-8") as alto_file:
-                pages_json_data = json.load(alto_file)
+            # Add JSON file information to the pages_data dictionary
+            pages_data[pages_file_name] = {
+                "image": os.path.join(image_directory, f"{page.id}.png"),
+                "page": pages_file_path,
+                "model": page,
+                "blocks": {},
+            }
 
-                unique_ids = []
-                for region_info in pages_json_data.get("r", []):
-                    part_id = region_info.get("pOf")
-                    if part_id:
-                        unique_ids.append(part_id)
+    return pages_data, total_blocks
 
-                articles_info = {}
 
-                for unique_id in unique_ids:
-                    unique_id_frequency[unique_id] += 1
-                    block_name = f"{unique_id}-block_{unique_id_frequency[unique_id]}"
-                    articles_info[block_name] = {}
-                    total_blocks += 1
+def find_issues(issues_directory: str) -> List[str]:
+    """
+    Identifies all issue files within the specified directory.
+
+    Args:
+            issues_directory (str): Path to the directory containing one folder per issue.
 
-                # Add JSON file information to the pages_data dictionary
-                pages_data[pages_file_name] = {
-                    "image": os.path.join(
-                        image_directory, f"{pages_json_data['id']}.png"
-                    ),
-                    "page": pages_file_path,
-                    "blocks": articles_info,
-                }
+    Returns:
+            List[str]: Sorted paths of the issue JSON files.
+    """
+    # Check each folder in the issues_directory
+    issues_paths = list()
+    for folder_name in sorted(os.listdir(issues_directory)):
+        folder_path = os.path.join(issues_directory, folder_name)
+
+        # Check if it is a directory
+        if os.path.isdir(folder_path):
+            for f in sorted(os.listdir(folder_path)):
+                if f.endswith(".json"):
+                    json_file_path = os.path.join(folder_path, f)
+                    issues_paths.append(json_file_path.strip())
+    print("identified all issues files within directory")
+    return issues_paths
+
+
+def load_item_types(issue_path: str) -> Dict[str, str]:
+    """
+    Loads the content item index of an issue.
 
-                for block_name, block_info in pages_json_data.get("blocks", {}).items():
-                    pages_data[pages_file_name]["blocks"][block_name] = block_info
+    Args:
+        issue_path (str): Path to the issue file.
 
-    return pages_data, total_blocks
+    Returns:
+        Dict[str, str]: Type ('m.tp', e.g. 'article' or 'ad') of every content item ('m.id') of the issue,
+        empty if no content item types are targeted (ct.TARGET_ITEM_TYPES is None).
+    """
+    if ct.TARGET_ITEM_TYPES == None:
+        return {}
+    item_types = dict()
+    for item in load_json(issue_path).get("i", []):
+        metadata = item.get("m", {})
+        if "id" in metadata:
+            item_types[metadata["id"]] = metadata.get("tp")
+    return item_types
+
+
+def filter_item_types(
+    page: Page, item_types: Dict[str, str], removed: Dict[str, int]
+) -> int:
+    """
+    Removes the regions of content items that are not of a target type (ct.TARGET_ITEM_TYPES) from a page model.
+
+    Args:
+        page (Page): Page model, whose 'regions' are filtered.
+        item_types (Dict[str, str]): Content item index of the issue, as returned by "load_item_types".
+        removed (Dict[str, int]): Number of removed regions per item type, updated in place.
+
+    Returns:
+        int: Number of removed regions.
+
+    Note:
+        Only the regions processed by the enhancement are filtered, the page data (and thereby the written page)
+        keeps all regions. Regions of items missing in the index are kept.
+    """
+    n_removed = 0
+    for block_name in list(page.regions):
+        item_type = item_types.get(page.regions[block_name].get("pOf"))
+        if item_type != None and item_type not in ct.TARGET_ITEM_TYPES:
+            del page.regions[block_name]
+            removed[item_type] = removed.get(item_type, 0) + 1
+            n_removed += 1
+    return n_removed
+
+
+# summary information about regions removed by the content item type filter
+def removed_types_info(removed: Dict[str, int]) -> str:
+    if len(removed) == 0:
+        return ""
+    return ", skipped by type: " + ", ".join(
+        str(removed[item_type]) + " " + str(item_type) for item_type in sorted(removed, key=str)
+    )
@@ -0,0 +1,222 @@
+import constants.constants as ct
+import os
+import json
+import hashlib
+from typing import Any, Dict, List, Optional
+
+# name of the manifest file inside the "enhanced" folder of an issue
+MANIFEST_NAME = "manifest.json"
+
+# fingerprint of models/final/, computed once per process
+fingerprint_cache = dict()
+
+
+def file_hash(path: str) -> Optional[str]:
+    """
+    Returns the sha1 hash of the content of a file.
+
+    Args:
+            path (str): Path to the file.
+
+    Returns:
+            Optional[str]: Hex digest of the file content, None if the file doesn't exist.
+    """
+    if not os.path.isfile(path):
+        return None
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def model_fingerprint() -> str:
+    """
+    Returns a fingerprint of all models stored in models/final/.
+
+    Returns:
+            str: sha1 hash over the names and content hashes of all files in models/final/.
+    """
+    if "final" not in fingerprint_cache:
+        sha1 = hashlib.sha1()
+        final_path = ct.MODELS_PATH + "final/"
+        for root, _, files in sorted(os.walk(final_path)):
+            for f in sorted(files):
+                path = os.path.join(root, f)
+                sha1.update(os.path.relpath(path, final_path).encode("utf-8"))
+                sha1.update(file_hash(path).encode("utf-8"))
+        fingerprint_cache["final"] = sha1.hexdigest()
+    return fingerprint_cache["final"]
+
+
+# target content item types as stored in the manifest, None if all content items are enhanced
+def item_types_key() -> Optional[List[str]]:
+    if ct.TARGET_ITEM_TYPES == None:
+        return None
+    return sorted(ct.TARGET_ITEM_TYPES)
+
+
+class Manifest:
+    """
+    Run manifest of a single issue, stored in the "enhanced" folder of the issue.
+
+    Attributes:
+            path (str): Path to the manifest file.
+            data (Dict[str, Any]): Content of the manifest: enhancement prediction threshold, model fingerprint,
+                    output mode ('pages' or 'sidecar'), target content item types, line mode, use of the page lines,
+                    triage, completion status of the issue and, per page, the hashes of its page and image files
+                    and the blocks that failed.
+            resumed (bool): Whether completed pages of a previous run with the same models and threshold were found.
+
+    Note:
+            A page is only considered done if it was completed with the same models, threshold, output mode, target
+            content item types, line mode, use of the page lines and triage, and neither its page file nor its image
+            changed since. The manifest is saved after every completed page, so that an interrupted run can resume
+            from the last completed page.
+
+    Example:
+            >>> manifest = Manifest('/path/to/issue/enhanced', 0.02)
+            >>> manifest.page_done('NZG-1881-10-01-a-p0001.json', file_data)
+            False
+    """
+
+    def __init__(self, directory: str, required_epr: float, output: str = "pages"):
+        self.path = os.path.join(directory, MANIFEST_NAME)
+        self.data = {
+            "required_epr": required_epr,
+            "models": model_fingerprint(),
+            "output": output,
+            "item_types": item_types_key(),
+            "line_ocr": ct.LINE_OCR,
+            "page_lines": ct.PAGE_LINES,
+            "triage": ct.TRIAGE,
+            "complete": False,
+            "pages": {},
+        }
+        self.hashes = dict()
+        self.resumed = False
+
+        if os.path.isfile(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as manifest_file:
+                    previous = json.load(manifest_file)
+            except ValueError:
+                print("ignoring unreadable manifest " + self.path)
+                return
+            if (
+                previous.get("required_epr") == required_epr
+                and previous.get("models") == self.data["models"]
+                and previous.get("output", "pages") == output
+                and previous.get("item_types") == self.data["item_types"]
+                and previous.get("line_ocr", False) == ct.LINE_OCR
+                and previous.get("page_lines", False) == ct.PAGE_LINES
+                and previous.get("triage", False) == ct.TRIAGE
+            ):
+                self.data["pages"] = previous.get("pages", {})
+                self.resumed = len(self.data["pages"]) > 0
+
+    # hashes of the page file and image of a page
+    def get_hashes(self, page_id: str, file_data: Dict[str, Any]) -> Dict[str, str]:
+        if page_id not in self.hashes:
+            self.hashes[page_id] = {
+                "page": file_hash(file_data["page"]),
+                "image": file_hash(file_data["image"]),
+            }
+        return self.hashes[page_id]
+
+    def page_done(self, page_id: str, file_data: Dict[str, Any]) -> bool:
+        """
+        Checks whether a page was completed by a previous run with unchanged inputs and models.
+
+        Args:
+                page_id (str): Name of the page file.
+                file_data (Dict[str, Any]): Information about the page, as returned by "parse_pages_structure".
+
+        Returns:
+                bool: True if the page can be skipped.
+        """
+        entry = self.data["pages"].get(page_id)
+        if entry == None or not entry.get("complete", False):
+            return False
+        hashes = self.get_hashes(page_id, file_data)
+        return entry.get("page") == hashes["page"] and entry.get("image") == hashes["image"]
+
+    def mark_page(
+        self, page_id: str, file_data: Dict[str, Any], processed_blocks: int
+    ) -> None:
+        """
+        Records a completed page and saves the manifest.
+
+        Args:
+                page_id (str): Name of the page file.
+                file_data (Dict[str, Any]): Information about the page, as returned by "parse_pages_structure".
+                processed_blocks (int): Number of blocks of the page that received new ocr.
+
+        Returns:
+                None
+        """
+        entry = dict(self.get_hashes(page_id, file_data))
+        entry["complete"] = True
+        entry["processed_blocks"] = processed_blocks
+        self.data["pages"][page_id] = entry
+        self.save()
+
+    def mark_failed(
+        self, page_id: str, file_data: Dict[str, Any], failed_blocks: List[str]
+    ) -> None:
+        """
+        Records a page with blocks that could not be processed and saves the manifest.
+
+        Args:
+                page_id (str): Name of the page file.
+                file_data (Dict[str, Any]): Information about the page, as returned by "parse_pages_structure".
+                failed_blocks (List[str]): IDs of the blocks of the page that failed.
+
+        Returns:
+                None
+
+        Note:
+                The page is not completed, so that the next run processes it again (see "page_done").
+        """
+        entry = dict(self.get_hashes(page_id, file_data))
+        entry["complete"] = False
+        entry["failed_blocks"] = failed_blocks
+        self.data["pages"][page_id] = entry
+        self.save()
+
+    def reset(self) -> None:
+        """
+        Forgets about all previously completed pages and saves the manifest.
+
+        Returns:
+                None
+
+        Note:
+                The manifest is saved right away, so that a run completing no page (e.g. because its budget is
+                exhausted) doesn't leave the completed pages of a previous run behind.
+        """
+        self.data["pages"] = {}
+        self.data["complete"] = False
+        self.resumed = False
+        self.save()
+
+    def set_complete(self, complete: bool) -> None:
+        """
+        Records the completion status of the whole issue and saves the manifest.
+
+        Args:
+                complete (bool): Whether all pages of the issue are done.
+
+        Returns:
+                None
+        """
+        self.data["complete"] = complete
+        self.save()
+
+    # writes the manifest atomically, so that a crash never leaves a truncated file behind
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as manifest_file:
+            json.dump(self.data, manifest_file, indent=2)
+        os.replace(temp_path, self.path)
@@ -0,0 +1,153 @@
+import os
+import json
+from collections import defaultdict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from enhance.storage import dump_json, load_json, open_text, strip_extension
+
+
+class Page:
+    """
+    In-memory model of a single Impresso page JSON.
+
+    The page file is parsed exactly once and the resulting model is shared by the structure parsing,
+    the text extraction, the enhancement prediction and the injection of new ocr results. Regions are
+    modified in place and the page is serialized once, after the last block on it has been processed.
+
+    Attributes:
+            path (str): Path to the original page file (name of the page for pages read from a JSONL stream).
+            file_name (str): Name of the original page file.
+            data (Dict[str, Any]): Parsed content of the page file.
+            id (str): ID of the page (e.g. 'NZG-1881-10-01-a-p0001').
+            year (int): Year of publication, taken from the page ID.
+            regions (Dict[str, Dict[str, Any]]): Regions with a 'pOf' value, keyed by block name.
+            modified (bool): Whether at least one region received new ocr results.
+
+    Note:
+            Block names are built from the 'pOf' ID of a region followed by '-block_1', '-block_2', etc.,
+            depending on how often the same 'pOf' ID already occurred on the page.
+
+    Example:
+            >>> page = Page('/path/to/issue/pages/NZG-1881-10-01-a-p0001.json')
+            >>> list(page.regions)[:2]
+            ['NZG-1881-10-01-a-i0030-block_1', 'NZG-1881-10-01-a-i0029-block_1']
+    """
+
+    def __init__(self, path: str, data: Optional[Dict[str, Any]] = None):
+        self.path = path
+        self.file_name = os.path.basename(path)
+        if data == None:
+            data = load_json(path)
+        self.data = data
+        self.id = self.data.get("id", strip_extension(self.file_name))
+        self.year = int(self.id.split("-")[1])
+        self.modified = False
+
+        self.regions = dict()
+        part_id_frequency = defaultdict(int)
+        for region in self.data.get("r", []):
+            part_id = region.get("pOf")
+            if part_id:
+                part_id_frequency[part_id] += 1
+                self.regions[f"{part_id}-block_{part_id_frequency[part_id]}"] = region
+
+    def get_text(self, block_name: str) -> str:
+        """
+        Returns the original ocr text of a region, one line per row.
+
+        Args:
+                block_name (str): Name of the block the region belongs to.
+
+        Returns:
+                str: Original text of the region, tokens separated by spaces and lines by '\\n'.
+        """
+        text_parts = []
+        for para_info in self.regions[block_name].get("p", []):
+            for line_info in para_info.get("l", []):
+                text_parts.extend(
+                    [text_info.get("tx", "") for text_info in line_info.get("t", [])]
+                )
+                text_parts.append("\n")
+        return " ".join(text_parts)
+
+    def get_lines(self, block_name: str) -> List[Tuple[List[int], str]]:
+        """
+        Returns the lines of the original ocr of a region.
+
+        Args:
+                block_name (str): Name of the block the region belongs to.
+
+        Returns:
+                List[Tuple[List[int], str]]: Coordinates [x, y, w, h] (page space) and text (tokens separated by
+                spaces) of every line, in the order of "get_text".
+        """
+        lines = []
+        for para_info in self.regions[block_name].get("p", []):
+            for line_info in para_info.get("l", []):
+                text = " ".join(
+                    [text_info.get("tx", "") for text_info in line_info.get("t", [])]
+                )
+                lines.append((line_info.get("c", [0, 0, 0, 0]), text))
+        return lines
+
+    def get_coordinates(self, block_name: str) -> List[int]:
+        """
+        Returns the coordinates [x, y, w, h] of a region.
+
+        Args:
+                block_name (str): Name of the block the region belongs to.
+
+        Returns:
+                List[int]: Coordinates of the region.
+        """
+        return self.regions[block_name].get("c", "")
+
+    def set_enhanced(self, block: Any) -> None:
+        """
+        Writes the new ocr results of a block into its region.
+
+        Args:
+                block (Block): Processed block holding 'ocr', 'ocr_ori' and 'font'.
+
+        Returns:
+                None
+        """
+        region = self.regions[block.block_id]
+        region["predicted_font"] = block.font
+        region["original_text"] = block.ocr_ori
+        region["enhanced_text"] = block.ocr
+        self.modified = True
+
+    def write(self, path: str) -> None:
+        """
+        Serializes the page, including all enhanced regions, to path.
+
+        Args:
+                path (str): Destination of the page file, compressed if it ends in '.gz' or '.bz2'.
+
+        Returns:
+                None
+        """
+        dump_json(self.data, path)
+
+
+def read_pages_jsonl(path: str) -> Iterator[Page]:
+    """
+    Streams the pages of a pages JSONL file, one page record at a time.
+
+    Args:
+            path (str): Path to the '*-pages.jsonl', '*-pages.jsonl.gz' or '*-pages.jsonl.bz2' file.
+
+    Returns:
+            Iterator[Page]: Page models in the order of the file.
+
+    Example:
+            >>> for page in read_pages_jsonl('/path/to/issue/pages/NZG-1881-10-01-a-pages.jsonl'):
+            ...     print(page.id)
+            NZG-1881-10-01-a-p0001
+    """
+    with open_text(path, "r") as jsonl_file:
+        for line in jsonl_file:
+            if line.strip() == "":
+                continue
+            record = json.loads(line)
+            yield Page(record["id"] + ".json", record)
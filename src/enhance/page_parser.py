@@ -1,10 +1,10 @@
 import constants.constants as ct
 import numpy as np
-from epr.apply_epr import predict
-import os
-import json
-import numpy as np
-from typing import Dict, Any
+from epr.knn_epr import predict_batch
+from enhance.page_model import Page
+from enhance.cost_model import block_features
+from enhance.epr_store import page_features
+from typing import Any, Dict, List, Tuple
 
 
 # class grouping all properties related to a single text block
@@ -37,6 +37,11 @@ class Block:
             garbage_ori (Union[Any, None]): Original garbage information associated with the text block.
             trigrams_ori (Union[Any, None]): Original trigrams information associated with the text block.
             enhance (Union[Any, None]): Enhancement information associated with the text block.
+            cached (bool): Boolean indicating if the ocr results were taken from the ocr cache.
+            cost_features (Union[Dict[str, Any], None]): Features of the region determining its ocr runtime (see "block_features").
+            lines_ori (Union[Any, None]): Coordinates and text of the lines of the original OCR output (see "Page.get_lines").
+            ocr_lines (Union[List[int], None]): Indices of the lines in lines_ori to be recognized again, None to recognize the whole block.
+            triage (Union[str, None]): Reason why the block was dropped before binarization (see "triage_block"), None if it was not dropped.
 
     Methods:
             __init__(self, arg): Constructor method for the Block class.
@@ -83,6 +88,11 @@ class Block:
         self.garbage_ori = None
         self.trigrams_ori = None
         self.enhance = None
+        self.cached = False
+        self.cost_features = None
+        self.lines_ori = None
+        self.ocr_lines = None
+        self.triage = None
 
     # returns a string version of the ocr output of the block
     def __str__(self):
@@ -102,20 +112,61 @@ class Block:
         return return_str
 
 
+def select_lines(
+    lines: List[Tuple[List[int], str]], coordinates: List[int], features: Any, lang: str
+) -> List[int]:
+    """
+    Selects the lines of the original ocr of a block that look bad and are recognized again in line mode.
+
+    Args:
+            lines (List[Tuple[List[int], str]]): Coordinates and text of the lines of the block (see "Page.get_lines").
+            coordinates (List[int]): Coordinates [x, y, w, h] of the block.
+            features (Features): Object computing the dictionary and garbage scores.
+            lang (str): Language of the block.
+
+    Returns:
+            List[int]: Indices of the lines whose dictionary score is below ct.LINE_MIN_DICT or whose garbage score
+            exceeds ct.LINE_MAX_GARBAGE.
+
+    Note:
+            Lines without tokens (e.g. punctuation only) and lines lying outside of the block are never selected.
+
+    Example:
+            >>> select_lines(page.get_lines(block_name), page.get_coordinates(block_name), features, 'de')
+            [3, 17, 18]
+    """
+    selected = list()
+    for i, (line_coordinates, text) in enumerate(lines):
+        if (
+            line_coordinates[0] >= coordinates[0] + coordinates[2]
+            or line_coordinates[1] >= coordinates[1] + coordinates[3]
+            or line_coordinates[0] + line_coordinates[2] <= coordinates[0]
+            or line_coordinates[1] + line_coordinates[3] <= coordinates[1]
+        ):
+            continue
+        tokens = features.get_tokens(text).non_empty()
+        if len(tokens) == 0:
+            continue
+        if (
+            features.get_dict_score(tokens, lang) < ct.LINE_MIN_DICT
+            or features.get_garbage_score(tokens) > ct.LINE_MAX_GARBAGE
+        ):
+            selected.append(i)
+    return selected
+
+
 def process_pages_file(
-    root_path: str,
-    page_file_name: str,
+    page: Page,
     block_data: Dict[str, Block],
     features: Any,
     required_epr: float,
     models: Any,
 ) -> Dict[str, Block]:
     """
-    Process the content of a specific page file, extracting information for each text block/region.
+    Process the content of a specific page, extracting information for each text block/region.
 
     Args:
-            root_path (str): The root path containing the 'pages' directory.
-            page_file_name (str): The name of the page file to be processed.
+            page (Page): Page model holding the already parsed page file.
             block_data (Dict[str, Block]): Dictionary containing information about text blocks.
             features (Any): Features object for text processing (if available).
             required_epr (float): Required enhancement prediction threshold.
@@ -126,81 +177,78 @@ def process_pages_file(
 
     Note:
             The function extracts important information like coordinates, original ocr, etc for each block/region inside the page.
+            The page file is not read again, all information is taken from the shared page model. The features of the
+            enhancement prediction are taken from the feature store if possible (see "page_features").
             The 'required_epr' parameter is the threshold for enhancement prediction. Blocks with predictions below this
-            threshold will not be enhanced.
+            threshold will not be enhanced. In line mode (ct.LINE_OCR), the lines to be recognized again are selected
+            for all other blocks (see "select_lines"), blocks without such lines are dropped, so that their image is
+            never cropped and their region stays unchanged. With ct.PAGE_LINES, the lines of the original ocr of every
+            block are kept, so that they replace the segmentation. The spell checks of the page are written to the
+            word cache if enabled (see "WordCache").
 
 
     Example:
-            >>> processed_blocks = process_pages_file('/path/to/root', 'example_page.json', {}, features_obj, 0.5, loaded_models)
+            >>> processed_blocks = process_pages_file(page, {}, features_obj, 0.5, loaded_models)
             >>> print(processed_blocks)
             {'block_1': <Block object 1>, 'block_2': <Block object 2>, ...}
     """
 
-    page_directory = os.path.join(root_path, "pages")
-    page_file_path = os.path.join(page_directory, page_file_name)
-    year_str = page_file_name.split("-")[1]
-    year = int(year_str)
-
-    # Load JSON file
-    with open(page_file_path, "r", encoding="utf-8") as alto_file:
-        alto_json_data = json.load(alto_file)
-
-        new_core_block_name = ""
-        for region in alto_json_data.get("r", []):
-            coordinates = None
-            coordinates = region.get("c", "")
-            core_block_name = region.get("pOf")
-            if new_core_block_name != core_block_name:
-                block_index = 1
-                new_core_block_name = core_block_name
-
-            actual_block_name = f"{core_block_name}-block_{block_index}"
-            block_instance = Block(arg=actual_block_name)
-            block_instance.page_id = page_file_name
-            block_instance.orig_block_id = actual_block_name.split("-block")[0]
-
-            text_parts_1 = []
-            for para_info in region.get("p", []):
-                for line_info in para_info.get("l", []):
-                    line_text_parts = [
-                        text_info.get("tx", "") for text_info in line_info.get("t", [])
-                    ]
-                    text_parts_1.extend(line_text_parts)
-                    text_parts_1.append("\n")
-
-                block_text = " ".join(text_parts_1)
-
-                # Update block instance with coordinates and text
-                block_instance.coordinates = coordinates
-                block_instance.ocr_ori = block_text
-                block_instance.offset_alto = (int(coordinates[0]), int(coordinates[1]))
-                block_instance.year = year
-
-                # Update block_data with the new block instance
-                block_data[actual_block_name] = block_instance
-
-                block_index += 1
+    for actual_block_name in page.regions:
+        coordinates = page.get_coordinates(actual_block_name)
+        block_instance = Block(arg=actual_block_name)
+        block_instance.page_id = page.file_name
+        block_instance.orig_block_id = actual_block_name.split("-block")[0]
+
+        # Update block instance with coordinates and text
+        block_instance.coordinates = coordinates
+        block_instance.ocr_ori = page.get_text(actual_block_name)
+        block_instance.offset_alto = (int(coordinates[0]), int(coordinates[1]))
+        block_instance.year = page.year
+        block_instance.cost_features = block_features(page.regions[actual_block_name])
+
+        # Update block_data with the new block instance
+        block_data[actual_block_name] = block_instance
 
     if required_epr > -1 and features != None:
-        for block_id in block_data:
+        x_values = page_features(
+            page,
+            features,
+            models.epr["trigrams"],
+            lambda trigrams, lang: features.get_ranked_ngram_score(
+                trigrams, models.epr["ranks"][lang]
+            ),
+        )
+        # the predictions of all blocks of the page are computed in one batch
+        block_ids = list(block_data)
+        predictions = predict_batch(
+            models.epr,
+            np.array([x_values[block_id] for block_id in block_ids]),
+            models.epr["k"],
+        )
+        for block_id, prediction in zip(block_ids, predictions):
             block = block_data[block_id]
-            block.tokens_ori = features.get_tokens(block.ocr_ori)
-            lang_ori, trigrams_ori = features.get_ngrams(
-                block.tokens_ori, block.ocr_ori
-            )
             block.lang_ori = "de"  # assuming german text
-            block = features.compute_features_ori(block)
-            n_gram_score = features.get_ngram_score(
-                trigrams_ori, models.epr["trigrams"][block.lang_ori]
-            )
-            x = np.array(
-                [
-                    block.dict_ori,
-                    n_gram_score,
-                    block.garbage_ori,
-                    features.scale_year(block.year),
-                ]
+            block.dict_ori, _, block.garbage_ori, _ = x_values[block_id]
+            block.enhance = prediction
+
+    if ct.PAGE_LINES:
+        for block_id in block_data:
+            block_data[block_id].lines_ori = page.get_lines(block_id)
+
+    if ct.LINE_OCR and features != None:
+        for block_id in list(block_data):
+            block = block_data[block_id]
+            if block.enhance != None and block.enhance < required_epr:
+                continue
+            block.lines_ori = page.get_lines(block_id)
+            block.ocr_lines = select_lines(
+                block.lines_ori, block.coordinates, features, block.lang_ori or "de"
             )
-            block.enhance = predict(models.epr, x, models.epr["k"])
+            # all lines of the original ocr look fine: the region is left unchanged
+            if block.ocr_lines == []:
+                del block_data[block_id]
+
+    if features != None:
+        features.save_words()
 
     return block_data
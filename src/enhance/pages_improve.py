@@ -1,14 +1,33 @@
-from enhance.issue_parser import parse_pages_structure
+from enhance.issue_parser import (
+    filter_item_types,
+    find_issues,
+    load_item_types,
+    parse_pages_structure,
+    removed_types_info,
+)
 from epr.features_epr import Features
 from ocr.pipe.pipe import Models
 from enhance.image_cropper import get_images
-from enhance.page_parser import process_pages_file
-from ocr.pipe.pipe import ocr
+from enhance.page_parser import Block, process_pages_file
+from enhance.epr_store import spell_counts, spell_info
+from enhance.pipeline import run_stages
+from enhance.page_model import read_pages_jsonl
+from enhance.storage import dumps_line, is_jsonl_file, open_text, strip_extension
+from enhance.manifest import Manifest
+from enhance.sidecar import Sidecar
+from ocr.pipe.pipe import recognize
+from ocr.pipe.cache import load_cached
 import constants.constants as ct
 import os
-import json
+import io
 import time
 import shutil
+import threading
+import contextlib
+import traceback
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
 
 
 def incomplete_issue(issue_path: str) -> None:
@@ -28,53 +47,159 @@ def incomplete_issue(issue_path: str) -> None:
     print("Issue not processed entirely: " + issue_path)
 
 
-# pipeline for processing all the pages of a single issue
-def process_package(
-    old_issues_path: str, models: Models, features: Features, required_epr: float
-) -> None:
+# loads a single page: extracts the blocks, predicts their enhancement and crops the images of the selected ones
+def prepare_page(
+    page_id: str,
+    file_data: Dict[str, Any],
+    ark: str,
+    old_issues_path: str,
+    models: Models,
+    features: Features,
+    required_epr: float,
+) -> Optional[List[Block]]:
     """
-    Pipeline for processing all the pages of a single issue.
+    Prepares the blocks of a single page that need new ocr.
 
     Args:
-            old_issues_path (str): Path to the issue directory to be processed.
+            page_id (str): Name of the page file.
+            file_data (Dict[str, Any]): Information about the page, as returned by "parse_pages_structure".
+            ark (str): Name of the issue file.
+            old_issues_path (str): Path to the issue file.
             models (Models): Object containing the loaded OCR and enhancement prediction models.
             features (Features): Object containing additional features.
             required_epr (float): Enhancement prediction threshold for deciding which textblocks to process.
 
     Returns:
-            None: The function processes the issue pages and writes enhanced results to the directory.
-
-    Raises:
-            Any exceptions raised during the processing.
+            Optional[List[Block]]: Selected blocks of the page with their cropped images, None if the page image can't be used.
 
     Note:
-            This function processes all the pages of a single issue. It extracts necessary information realated to the issue and
-            pages structure using the "parse_pages_structure" followed by extracting coordinate information and texts for each regions
-            on the pages level using "process_pages_file". For each block inside each page, the enhancement threshold is checked, and if successful,
-            OCR is carried out on the block for enhancement. The new pages with enhanced OCR results are written inside the directory of
-            the issue inside the "enhanced" folder.
+            Blocks are selected (see "select_blocks") before the page image is accessed: the image of a page without
+            selected blocks is never decoded and other images are only decoded down to the lowest selected block.
+            Results of blocks found in the ocr cache are set right away, these blocks skip all further stages.
+    """
+    blocks_stuff = process_pages_file(
+        file_data["model"], file_data["blocks"], features, required_epr, models
+    )
+    selected = select_blocks(blocks_stuff, page_id, ark, old_issues_path, required_epr)
+    if get_images(file_data["image"], {block.block_id: block for block in selected}) == None:
+        return None
+    for block in selected:
+        load_cached(block, models)
+    return selected
+
+
+# returns the blocks of a page for which new ocr is required
+def select_blocks(
+    blocks_stuff: Dict[str, Block],
+    page_id: str,
+    ark: str,
+    old_issues_path: str,
+    required_epr: float,
+) -> List[Block]:
+    """
+    Selects the blocks of a page that need to be processed by ocr.
 
-    Example:
-            >>> process_package('/path/to/issue', models_instance, features_instance, 0.02)
+    Args:
+            blocks_stuff (Dict[str, Block]): Prepared blocks of the page.
+            page_id (str): Name of the page file.
+            ark (str): Name of the issue file.
+            old_issues_path (str): Path to the issue file.
+            required_epr (float): Enhancement prediction threshold for deciding which textblocks to process.
+
+    Returns:
+            List[Block]: Blocks that are not empty and whose predicted enhancement is high enough.
+
+    Note:
+            Selection runs before any image is decoded, so that rotated blocks can only be detected later by the
+            triage of their image (ct.TRIAGE, see "triage_block"), which leaves them with their original text.
+            In line mode, blocks without lines to be recognized again are already removed by "process_pages_file".
+    """
+    selected = list()
+    for block_id in blocks_stuff:
+        text = blocks_stuff[block_id].ocr_ori
+        enhance = blocks_stuff[block_id].enhance
+
+        if text == "":
+            print(
+                "ignoring empty text block: "
+                + block_id
+                + " - alto: "
+                + page_id
+                + " - ark: "
+                + ark
+                + " - mets: "
+                + old_issues_path
+            )
+            continue
+
+        # block is not processed because there is no epr model or predicted enhancement is too low
+        if enhance != None and enhance < required_epr:
+            continue
+
+        selected.append(blocks_stuff[block_id])
+    return selected
+
+
+# copies the pages of an issue to the output directory (or opens its sidecar) and parses their structure
+def open_issue(
+    old_issues_path: str, required_epr: float, force: bool = False, sparse: bool = False
+) -> Optional[
+    Tuple[
+        Dict[str, Dict[str, Any]],
+        int,
+        str,
+        str,
+        Manifest,
+        Optional[Sidecar],
+        Dict[str, int],
+    ]
+]:
     """
+    Prepares the output directory of an issue and parses the structure of its pages.
 
-    # start clock
-    before = int(round(time.time() * 1000))
+    Args:
+            old_issues_path (str): Path to the issue file.
+            required_epr (float): Enhancement prediction threshold for deciding which textblocks to process.
+            force (bool): Ignore the manifest of a previous run and start from scratch.
+            sparse (bool): Record the new ocr results in a sidecar (see "Sidecar") instead of copying all pages.
 
+    Returns:
+            Optional[Tuple[Dict[str, Dict[str, Any]], int, str, str, Manifest, Optional[Sidecar], Dict[str, int]]]:
+            The pages information of "parse_pages_structure", the number of target blocks, the name of the issue
+            file, the output directory of the pages, the run manifest of the issue, its sidecar (None unless sparse
+            is set) and the number of blocks removed per content item type. None if the issue can't be processed.
+
+    Note:
+            If the manifest of a previous run with the same models and threshold exists, the output directory is
+            kept and only the pages that are not done yet are reset to their original version.
+            Regions of content items that are not of a target type (see "filter_item_types") are removed from the
+            page models right away, before any enhancement prediction, image decoding or ocr.
+    """
     # copy package to new destination
     old_package_dir = os.path.dirname(old_issues_path)
     original_pages_directory = old_package_dir + "/pages"
     copied_pages_directory = old_package_dir + "/enhanced/pages"
+    ark = os.path.basename(old_issues_path)
+
+    sidecar = None
+    manifest = Manifest(
+        old_package_dir + "/enhanced", required_epr, "sidecar" if sparse else "pages"
+    )
+    if sparse:
+        sidecar = Sidecar(old_package_dir + "/enhanced", strip_extension(ark))
+        if force or not manifest.resumed or not sidecar.exists():
+            manifest.reset()
+            sidecar.reset()
+    elif force or not manifest.resumed or not os.path.isdir(copied_pages_directory):
+        manifest.reset()
 
-    # Delete the existing destination directory
-    if os.path.exists(copied_pages_directory):
-        shutil.rmtree(copied_pages_directory)
+        # Delete the existing destination directory
+        if os.path.exists(copied_pages_directory):
+            shutil.rmtree(copied_pages_directory)
 
-    shutil.copytree(original_pages_directory, copied_pages_directory)
+        shutil.copytree(original_pages_directory, copied_pages_directory)
 
     blocks_info, n_blocks = parse_pages_structure(old_package_dir)
-    ark = os.path.basename(old_issues_path)
-    processed_blocks = 0
     if ark == None:
         print("couldn't identify ark in " + old_issues_path)
         incomplete_issue(old_issues_path)
@@ -84,84 +209,325 @@ def process_package(
         incomplete_issue(old_issues_path)
         return
 
-        # Iterate through each JSON file in the directory
-    for page_id, file_data in blocks_info.items():
-        blocks_stuff = blocks_info[page_id]["blocks"]
-        blocks_stuff = process_pages_file(
-            old_package_dir, page_id, blocks_stuff, features, required_epr, models
+    item_types = load_item_types(old_issues_path)
+    removed_types = dict()
+    for file_data in blocks_info.values():
+        n_blocks -= filter_item_types(file_data["model"], item_types, removed_types)
+
+    # pages that are not done yet start again from their original version
+    if manifest.resumed:
+        for page_id, file_data in blocks_info.items():
+            if manifest.page_done(page_id, file_data):
+                continue
+            if sparse:
+                sidecar.remove_page(page_id)
+            else:
+                shutil.copyfile(
+                    file_data["page"], os.path.join(copied_pages_directory, page_id)
+                )
+
+    return (
+        blocks_info,
+        n_blocks,
+        ark,
+        copied_pages_directory,
+        manifest,
+        sidecar,
+        removed_types,
+    )
+
+
+# pipeline for processing all the pages of a single issue
+def process_package(
+    old_issues_path: str,
+    models: Models,
+    features: Features,
+    required_epr: float,
+    threads: int = 0,
+    force: bool = False,
+    sparse: bool = False,
+) -> None:
+    """
+    Pipeline for processing all the pages of a single issue.
+
+    Args:
+            old_issues_path (str): Path to the issue directory to be processed.
+            models (Models): Object containing the loaded OCR and enhancement prediction models.
+            features (Features): Object containing additional features.
+            required_epr (float): Enhancement prediction threshold for deciding which textblocks to process.
+            threads (int): Number of preprocessing threads for pipelined execution, 0 to process all stages serially.
+            force (bool): Ignore the run manifest and reprocess all pages.
+            sparse (bool): Write a sidecar with the new ocr results only, instead of all pages (see "Sidecar").
+
+    Returns:
+            None: The function processes the issue pages and writes enhanced results to the directory.
+
+    Raises:
+            Any exceptions raised during the processing.
+
+    Note:
+            This function processes all the pages of a single issue. It extracts necessary information realated to the issue and
+            pages structure using the "parse_pages_structure" followed by extracting coordinate information and texts for each regions
+            on the pages level using "process_pages_file". Every page file is parsed once into a Page model that is shared by all steps.
+            For each block inside each page, the enhancement threshold is checked, and if successful, OCR is carried out on the block
+            for enhancement. Once the last block of a page is done, the page with enhanced OCR results is written a single time
+            inside the directory of the issue inside the "enhanced" folder.
+            With threads > 0, the stages are run as a pipeline (see "run_pipelined"): pages are loaded and decoded ahead,
+            and blocks are preprocessed on multiple threads while recognition runs.
+            Completed pages are recorded in the run manifest of the issue (see "Manifest"). A rerun with unchanged
+            inputs, models and threshold skips these pages and resumes a half-finished issue from the last completed page.
+            With sparse set, no page is copied or written: the new ocr results are collected in the sidecar of the issue,
+            which is saved after every completed page and can be merged into the original pages with "merge_sidecar".
+
+    Example:
+            >>> process_package('/path/to/issue', models_instance, features_instance, 0.02)
+    """
+
+    # start clock
+    before = int(round(time.time() * 1000))
+    spelled = spell_counts(features)
+
+    issue = open_issue(old_issues_path, required_epr, force, sparse)
+    if issue == None:
+        return
+    (
+        blocks_info,
+        n_blocks,
+        ark,
+        copied_pages_directory,
+        manifest,
+        sidecar,
+        removed_types,
+    ) = issue
+    processed_blocks = 0
+    cached_blocks = 0
+    ocr_lines = [0, 0]
+    triaged = dict()
+    page_blocks = dict()
+
+    # pages completed by a previous run are skipped
+    pending_pages = [
+        (page_id, file_data)
+        for page_id, file_data in blocks_info.items()
+        if not manifest.page_done(page_id, file_data)
+    ]
+    reused_pages = len(blocks_info) - len(pending_pages)
+
+    def load_page(page_id, file_data):
+        return prepare_page(
+            page_id, file_data, ark, old_issues_path, models, features, required_epr
         )
-        copied_alto_file_path = os.path.join(copied_pages_directory, page_id)
 
-        image_path = blocks_info[page_id]["image"]
-        blocks_stuff = get_images(image_path, blocks_stuff)
-        if blocks_stuff == None:
-            incomplete_issue(old_issues_path)
+    # predicted enhancement is high enough: run ocr and add the enhanced text to the page model
+    def recognize_block(page_id, block):
+        nonlocal processed_blocks, cached_blocks
+        block = recognize(block, models)
+        if count_triaged(block, triaged):
             return
+        cached_blocks += block.cached
+        count_ocr_lines(block, ocr_lines)
+        if sidecar != None:
+            sidecar.add(page_id, block)
+        else:
+            blocks_info[page_id]["model"].set_enhanced(block)
+        processed_blocks += 1
+        page_blocks[page_id] = page_blocks.get(page_id, 0) + 1
+
+    # all blocks of the page are done: serialize the page (or the sidecar) once and record it in the manifest
+    def finish_page(page_id):
+        page = blocks_info[page_id]["model"]
+        if sidecar != None:
+            sidecar.save()
+        elif page.modified:
+            page.write(os.path.join(copied_pages_directory, page_id))
+        manifest.mark_page(page_id, blocks_info[page_id], page_blocks.get(page_id, 0))
+
+    # Iterate through each JSON file in the directory
+    if not run_stages(pending_pages, load_page, recognize_block, finish_page, threads):
+        incomplete_issue(old_issues_path)
+        return
 
-        for block_id in blocks_stuff:
-            rotated = blocks_stuff[block_id].rotated
-            text = blocks_stuff[block_id].ocr_ori
-            enhance = blocks_stuff[block_id].enhance
-
-            if rotated:
-                print(
-                    "ignoring rotated text block: "
-                    + block_id
-                    + " - alto: "
-                    + page_id
-                    + " - ark: "
-                    + ark
-                    + " - mets: "
-                    + old_issues_path
-                )
-                continue
-            elif text == "":
-                print(
-                    "ignoring empty text block: "
-                    + block_id
-                    + " - alto: "
-                    + page_id
-                    + " - ark: "
-                    + ark
-                    + " - mets: "
-                    + old_issues_path
-                )
-                continue
+    manifest.set_complete(True)
 
-            # block is not processed because there is no epr model or predicted enhancement is too low
-            if enhance != None and enhance < required_epr:
-                continue
+    time_needed = int(round(time.time() * 1000)) - before
+    print(
+        ark
+        + " processed successfully in "
+        + str(time_needed)
+        + " ms (new ocr for "
+        + str(processed_blocks)
+        + "/"
+        + str(n_blocks)
+        + " target blocks"
+        + cached_blocks_info(cached_blocks)
+        + ocr_lines_info(ocr_lines)
+        + triaged_info(triaged)
+        + removed_types_info(removed_types)
+        + spell_info(spell_counts(features, spelled))
+        + reused_pages_info(reused_pages, len(blocks_info))
+        + ")"
+    )
 
-            # predicted enhancement is high enough: run ocr
-            block = ocr(blocks_stuff[block_id], models)
 
-            with open(copied_alto_file_path, "r", encoding="utf-8") as json_file:
-                json_data = json.load(json_file)
+# streaming pipeline for processing the pages JSONL of a single issue
+def process_stream(
+    old_issues_path: str,
+    models: Models,
+    features: Features,
+    required_epr: float,
+    threads: int = 0,
+    force: bool = False,
+    sparse: bool = False,
+) -> None:
+    """
+    Streaming pipeline for processing the pages JSONL files of a single issue.
 
-            # Iterate through 'r' entries in the JSON data
-            block_index = 1
-            for region_entry in json_data.get("r", []):
-                pOf_value = region_entry.get("pOf", "")
+    Args:
+            old_issues_path (str): Path to the issue file, its 'pages' folder holding '*-pages.jsonl(.gz/.bz2)' files.
+            models (Models): Object containing the loaded OCR and enhancement prediction models.
+            features (Features): Object containing additional features.
+            required_epr (float): Enhancement prediction threshold for deciding which textblocks to process.
+            threads (int): Number of preprocessing threads for pipelined execution, 0 to process all stages serially.
+            force (bool): Ignore the run manifest and reprocess all JSONL files.
+            sparse (bool): Write a sidecar with the new ocr results only, instead of enhanced JSONL files.
+
+    Returns:
+            None: The function processes the issue pages and writes enhanced results to the directory.
+
+    Note:
+            Every JSONL file is read as a stream, one page record at a time, and an enhanced JSONL file (compressed
+            the same way) with the same page order is written to the "enhanced/pages" folder of the issue. Only the
+            pages that are currently processed are kept in memory. The run manifest records every JSONL file as a whole.
+            With sparse set, the sidecar of the issue replaces the enhanced JSONL files and is saved after every JSONL file.
+
+    Example:
+            >>> process_stream('/path/to/issue', models_instance, features_instance, 0.02)
+    """
 
-                if pOf_value == block.orig_block_id:
-                    block_id = f"{pOf_value}-block_{block_index}"
-                    if block.block_id == block_id:
-                        enhanced_text = block.ocr
-                        original_text = block.ocr_ori
-                        predicted_font = block.font
+    # start clock
+    before = int(round(time.time() * 1000))
+    spelled = spell_counts(features)
 
-                        # Add the enhanced text to the JSON data
-                        region_entry["predicted_font"] = predicted_font
-                        region_entry["original_text"] = original_text
-                        region_entry["enhanced_text"] = enhanced_text
-                        break
-                    block_index += 1
+    old_package_dir = os.path.dirname(old_issues_path)
+    pages_directory = old_package_dir + "/pages"
+    images_directory = old_package_dir + "/images"
+    copied_pages_directory = old_package_dir + "/enhanced/pages"
+    ark = os.path.basename(old_issues_path)
 
-            # Save the updated JSON data back to the file
-            with open(copied_alto_file_path, "w", encoding="utf-8") as json_file:
-                json.dump(json_data, json_file, indent=2, ensure_ascii=False)
+    jsonl_names = [f for f in sorted(os.listdir(pages_directory)) if is_jsonl_file(f)]
+    if len(jsonl_names) == 0:
+        print("found no pages jsonl in " + pages_directory)
+        incomplete_issue(old_issues_path)
+        return
 
+    sidecar = None
+    manifest = Manifest(
+        old_package_dir + "/enhanced", required_epr, "sidecar" if sparse else "pages"
+    )
+    if sparse:
+        sidecar = Sidecar(old_package_dir + "/enhanced", strip_extension(ark))
+        if force or not sidecar.exists():
+            manifest.reset()
+            sidecar.reset()
+    elif force:
+        manifest.reset()
+
+    item_types = load_item_types(old_issues_path)
+    removed_types = dict()
+    n_blocks = 0
+    processed_blocks = 0
+    cached_blocks = 0
+    ocr_lines = [0, 0]
+    triaged = dict()
+    reused_files = 0
+    for jsonl_name in jsonl_names:
+        jsonl_data = {"page": os.path.join(pages_directory, jsonl_name), "image": ""}
+        if manifest.page_done(jsonl_name, jsonl_data):
+            reused_files += 1
+            continue
+        file_blocks = 0
+
+        # pages that are currently processed
+        in_flight = dict()
+
+        # pages are read on the feeder thread of a pipelined run (see "run_pipelined"), while blocks are recognized
+        # and pages finished on this thread: in_flight and the sidecar are only accessed holding the lock
+        # (n_blocks and removed_types are only updated by the feeder and read once run_stages returned)
+        lock = threading.Lock()
+
+        def pages():
+            nonlocal n_blocks
+            for page in read_pages_jsonl(jsonl_data["page"]):
+                filter_item_types(page, item_types, removed_types)
+                n_blocks += len(page.regions)
+                file_data = {
+                    "image": os.path.join(images_directory, f"{page.id}.png"),
+                    "page": None,
+                    "model": page,
+                    "blocks": {},
+                }
+                with lock:
+                    if sidecar != None:
+                        sidecar.remove_page(page.file_name)
+                    in_flight[page.file_name] = file_data
+                yield page.file_name, file_data
+
+        def load_page(page_id, file_data):
+            return prepare_page(
+                page_id, file_data, ark, old_issues_path, models, features, required_epr
+            )
+
+        def recognize_block(page_id, block):
+            nonlocal processed_blocks, cached_blocks, file_blocks
+            block = recognize(block, models)
+            if count_triaged(block, triaged):
+                return
+            cached_blocks += block.cached
+            count_ocr_lines(block, ocr_lines)
+            with lock:
+                if sidecar != None:
+                    sidecar.add(page_id, block)
+                else:
+                    in_flight[page_id]["model"].set_enhanced(block)
             processed_blocks += 1
+            file_blocks += 1
+
+        # pages are finished in the order of the stream
+        def finish_page(page_id):
+            with lock:
+                page = in_flight.pop(page_id)["model"]
+            if sidecar == None:
+                output.write(dumps_line(page.data))
+
+        if sidecar != None:
+            if not run_stages(pages(), load_page, recognize_block, finish_page, threads):
+                incomplete_issue(old_issues_path)
+                return
+            sidecar.save()
+            manifest.mark_page(jsonl_name, jsonl_data, file_blocks)
+            continue
+
+        # the enhanced file only replaces the output once all of its pages are written
+        # (the temporary file keeps the extension, so that it is compressed with the same codec)
+        os.makedirs(copied_pages_directory, exist_ok=True)
+        output_path = os.path.join(copied_pages_directory, jsonl_name)
+        temp_path = os.path.join(copied_pages_directory, "tmp-" + jsonl_name)
+        complete = False
+        try:
+            with open_text(temp_path, "w") as output:
+                complete = run_stages(
+                    pages(), load_page, recognize_block, finish_page, threads
+                )
+        finally:
+            if not complete:
+                os.remove(temp_path)
+        if not complete:
+            incomplete_issue(old_issues_path)
+            return
+        os.replace(temp_path, output_path)
+        manifest.mark_page(jsonl_name, jsonl_data, file_blocks)
+
+    manifest.set_complete(True)
 
     time_needed = int(round(time.time() * 1000)) - before
     print(
@@ -172,63 +538,257 @@ def process_package(
         + str(processed_blocks)
         + "/"
         + str(n_blocks)
-        + " target blocks)"
+        + " target blocks"
+        + cached_blocks_info(cached_blocks)
+        + ocr_lines_info(ocr_lines)
+        + triaged_info(triaged)
+        + removed_types_info(removed_types)
+        + spell_info(spell_counts(features, spelled))
+        + reused_pages_info(reused_files, len(jsonl_names), "jsonl files")
+        + ")"
+    )
+
+
+# summary information about blocks whose results were taken from the ocr cache
+def cached_blocks_info(cached_blocks: int) -> str:
+    if cached_blocks == 0:
+        return ""
+    return ", " + str(cached_blocks) + " from ocr cache"
+
+
+# counts the lines recognized again and all lines of a block processed in line mode
+def count_ocr_lines(block: Block, ocr_lines: List[int]) -> None:
+    if block.ocr_lines != None:
+        ocr_lines[0] += len(block.ocr_lines)
+        ocr_lines[1] += len(block.lines_ori)
+
+
+# summary information about the lines recognized again in line mode
+def ocr_lines_info(ocr_lines: List[int]) -> str:
+    if ocr_lines[1] == 0:
+        return ""
+    return ", " + str(ocr_lines[0]) + "/" + str(ocr_lines[1]) + " lines recognized again"
+
+
+# counts a block dropped by the triage per reason, returns False if the block was not dropped
+def count_triaged(block: Block, triaged: Dict[str, int]) -> bool:
+    if block.triage == None:
+        return False
+    triaged[block.triage] = triaged.get(block.triage, 0) + 1
+    return True
+
+
+# summary information about the blocks dropped by the triage, e.g. ", dropped by triage: 2 blank, 1 rotated"
+def triaged_info(triaged: Dict[str, int]) -> str:
+    if len(triaged) == 0:
+        return ""
+    return ", dropped by triage: " + ", ".join(
+        str(triaged[reason]) + " " + reason for reason in sorted(triaged)
     )
 
 
+# summary information about pages taken over from a previous run
+def reused_pages_info(reused_pages: int, n_pages: int, unit: str = "pages") -> str:
+    if reused_pages == 0:
+        return ""
+    return ", " + str(reused_pages) + "/" + str(n_pages) + " " + unit + " done by previous run"
+
+
+def load_enhance_models(
+    required_epr: float, require_ocr: bool = True
+) -> Tuple[Models, Features, float]:
+    """
+    Loads the OCR, font recognition and enhancement prediction models together with the EPR features.
+
+    Args:
+            required_epr (float): Enhancement prediction threshold for deciding which textblocks to process.
+            require_ocr (bool): If False, only the enhancement prediction model is loaded.
+
+    Returns:
+            Tuple[Models, Features, float]: The loaded models, the features object (None if epr and the line mode
+            are disabled) and the threshold, set to -1 if no epr model could be found.
+
+    Example:
+            >>> models, features, required_epr = load_enhance_models(0.02)
+    """
+    models = Models()
+    if require_ocr:
+        models.load_final_models(True)
+    else:
+        models.load_final_epr_model()
+    if models.epr == None and required_epr > -1:
+        required_epr = -1
+        print(
+            "no enhancement prediction (epr) model found in models/final/ -> running ocr for all target blocks"
+        )
+
+    features = None
+    if required_epr > -1 or ct.LINE_OCR:
+        features = Features()
+
+    return models, features, required_epr
+
+
+# processes a single issue from page JSON files or, with the 'jsonl' option, from pages JSONL streams
+def run_issue(
+    issue_path: str,
+    models: Models,
+    features: Features,
+    required_epr: float,
+    options: Dict[str, Any],
+) -> None:
+    process = process_stream if options["jsonl"] else process_package
+    process(
+        issue_path,
+        models,
+        features,
+        required_epr,
+        options["threads"],
+        options["force"],
+        options["sparse"],
+    )
+
+
+# models and features of a worker process, loaded once by init_worker
+worker_state = dict()
+
+
+def init_worker(required_epr: float, options: Dict[str, Any]) -> None:
+    """
+    Initializer of the worker processes, loading models and features once per process.
+
+    Args:
+            required_epr (float): Enhancement prediction threshold for deciding which textblocks to process.
+            options (Dict[str, Any]): Options of "improve_pages" that are passed on to every issue.
+
+    Returns:
+            None
+    """
+    worker_state["options"] = options
+    log = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(log):
+            models, features, required_epr = load_enhance_models(required_epr)
+        worker_state["models"] = models
+        worker_state["features"] = features
+        worker_state["required_epr"] = required_epr
+    except (Exception, SystemExit):
+        worker_state["error"] = log.getvalue() + traceback.format_exc()
+
+
+def process_issue(issue_path: str) -> Tuple[str, str, Optional[str]]:
+    """
+    Processes a single issue inside a worker process.
+
+    Args:
+            issue_path (str): Path to the issue file to be processed.
+
+    Returns:
+            Tuple[str, str, Optional[str]]: The issue path, everything printed while processing the issue
+            and the error message (None if the issue was processed without exception).
+
+    Note:
+            Output is captured instead of printed, so that the main process can report the issues in a
+            deterministic order. Exceptions are caught so that a failed issue does not stop the remaining ones.
+    """
+    if "error" in worker_state:
+        return issue_path, "", "worker could not load models\n" + worker_state["error"]
+
+    log = io.StringIO()
+    error = None
+    with contextlib.redirect_stdout(log):
+        try:
+            run_issue(
+                issue_path,
+                worker_state["models"],
+                worker_state["features"],
+                worker_state["required_epr"],
+                worker_state["options"],
+            )
+        except Exception:
+            error = traceback.format_exc()
+    return issue_path, log.getvalue(), error
+
+
 # aims to enhance pages of the issues by running ocr on a select subset of textblocks only
-def improve_pages(issues_directory: str, required_epr: float) -> None:
+def improve_pages(
+    issues_directory: str,
+    required_epr: float,
+    workers: int = 1,
+    threads: int = 0,
+    force: bool = False,
+    jsonl: bool = False,
+    sparse: bool = False,
+) -> None:
     """
     Enhances OCR quality for pages of issues in the specified directory.
 
     Args:
             issues_directory (str): Path to the directory containing the issues to be enhanced.
             required_epr (float): Enhancement prediction threshold for deciding which textblocks to process.
+            workers (int): Number of worker processes, issues are processed in the main process if set to 1.
+            threads (int): Number of preprocessing threads for pipelined execution inside every issue, 0 to disable.
+            force (bool): Ignore the run manifests of previous runs and reprocess all pages.
+            jsonl (bool): Stream the pages JSONL files of the issues instead of reading single page files.
+            sparse (bool): Write one sidecar per issue with the new ocr results instead of full copies of the pages.
 
     Returns:
             None: The function does not return a value but saves enhanced results in a new directory.
 
     Raises:
-            Any exceptions raised during the process_package function.
+            Any exceptions raised during the process_package function (only if workers is set to 1).
 
     Note:
             This function aims to enhance pages of issues by running OCR on a select subset of textblocks only.
             It identifies issues files within the specified directory, loads necessary OCR and enhancement prediction models,
             and processes each issue individually, saving the enhanced results in a new directory.
+            With more than one worker, issues are distributed over a process pool in which every worker loads the
+            models once. Results are reported in the order of the issues, failed issues are reported with their error
+            as they come and listed again at the end.
 
     Example:
-            >>> improve_pages('/path/to/issues', 0.02)
+            >>> improve_pages('/path/to/issues', 0.02, workers=4)
     """
 
-    # Check each folder in the issues_directory
-    issues_paths = list()
-    for folder_name in os.listdir(issues_directory):
-        folder_path = os.path.join(issues_directory, folder_name)
-
-        # Check if it is a directory
-        if os.path.isdir(folder_path):
-            for f in os.listdir(folder_path):
-                if f.endswith(".json"):
-                    json_file_path = os.path.join(folder_path, f)
-                    issues_paths.append(json_file_path)
-    print("identified all issues files within directory")
-
-    # load models
-    models = Models()
-    models.load_final_models(True)
-    if models.epr == None and required_epr > -1:
-        required_epr = -1
+    issues_paths = find_issues(issues_directory)
+    options = {"threads": threads, "force": force, "jsonl": jsonl, "sparse": sparse}
+
+    if workers > 1:
+        failed_issues = list()
+        # fork keeps the configuration read from config.ini in the worker processes
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=init_worker,
+            initargs=(required_epr, options),
+        ) as executor:
+            futures = [
+                executor.submit(process_issue, issue_path) for issue_path in issues_paths
+            ]
+            for issue_path, future in zip(issues_paths, futures):
+                try:
+                    _, log, error = future.result()
+                except Exception:
+                    log, error = "", traceback.format_exc()
+                print(log, end="")
+                if error != None:
+                    print("Issue failed: " + issue_path + "\n" + error)
+                    failed_issues.append(issue_path)
+                else:
+                    print(
+                        f"\nenhance completed - new json for pages and blocks are located in {os.path.dirname(issue_path)}/enhanced"
+                    )
         print(
-            "no enhancement prediction (epr) model found in models/final/ -> running ocr for all target blocks"
+            f"\n Enhancements for all the issues completed ({len(failed_issues)}/{len(issues_paths)} failed)"
         )
+        for issue_path in failed_issues:
+            print("Issue failed: " + issue_path)
+        return
 
-    features = None
-    if required_epr > -1:
-        features = Features()
+    models, features, required_epr = load_enhance_models(required_epr)
 
     for issue_path in issues_paths:
-        issue_path = issue_path.strip()
-        process_package(issue_path, models, features, required_epr)
+        run_issue(issue_path, models, features, required_epr, options)
 
         print(
             f"\nenhance completed - new json for pages and blocks are located in {os.path.dirname(issue_path)}/enhanced"
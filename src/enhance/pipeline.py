@@ -0,0 +1,161 @@
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from enhance.page_parser import Block
+from ocr.pipe.pipe import preprocess
+
+# number of pages that are loaded and decoded ahead of recognition
+IO_THREADS = 2
+
+# maximum number of blocks waiting for recognition
+READY_QUEUE_SIZE = 32
+
+# marks the end of a page / of all pages inside the ready queue
+PAGE_DONE = "page_done"
+PAGE_FAILED = "page_failed"
+ALL_DONE = "all_done"
+
+
+def run_pipelined(
+    pages: Iterable[Tuple[str, Dict[str, Any]]],
+    load_page: Callable[[str, Dict[str, Any]], Optional[List[Block]]],
+    recognize: Callable[[str, Block], None],
+    finish_page: Callable[[str], None],
+    threads: int,
+) -> bool:
+    """
+    Runs the stages of a single issue as a pipeline with bounded queues.
+
+    Args:
+            pages (Iterable[Tuple[str, Dict[str, Any]]]): Page IDs together with their page information, in processing order.
+            load_page (Callable): Returns the blocks of a page that need new ocr (None if the page can't be processed).
+            recognize (Callable): Runs font and character recognition on a preprocessed block of a page.
+            finish_page (Callable): Called once all blocks of a page have been recognized.
+            threads (int): Number of threads used for binarization and segmentation.
+
+    Returns:
+            bool: False if a page could not be loaded and the issue is incomplete, True otherwise.
+
+    Note:
+            Pages are loaded (text extraction, enhancement prediction and image decoding) on IO_THREADS threads,
+            ahead of recognition. Binarization and segmentation run in OpenCV, which releases the GIL, on a pool of
+            threads. The preprocessed blocks are handed over to recognition through a ready queue of at most
+            READY_QUEUE_SIZE blocks, so that decoding and preprocessing overlap with recognition while memory stays
+            bounded. Recognition itself runs in the calling thread, in the order of pages and blocks.
+
+            Threading contract: pages is iterated on a feeder thread and load_page runs on the IO_THREADS threads
+            (up to IO_THREADS pages at once), concurrently with recognize and finish_page, which only run on the
+            calling thread. State shared between these callables must be guarded by the caller. The models and
+            Features are shared by all of them: spell checks and the feature and word caches hold their own locks,
+            the other feature caches only memoize results of pure functions.
+
+    Example:
+            >>> run_pipelined(list(blocks_info.items()), load_page, recognize, finish_page, 4)
+            True
+    """
+    ready = queue.Queue(maxsize=READY_QUEUE_SIZE)
+    stop = threading.Event()
+
+    with ThreadPoolExecutor(IO_THREADS) as io_pool, ThreadPoolExecutor(
+        max(1, threads)
+    ) as cpu_pool:
+
+        # submits pages in order, keeping at most IO_THREADS pages loaded ahead
+        def feed():
+            try:
+                loading = deque()
+                for page_id, file_data in pages:
+                    loading.append(
+                        (page_id, io_pool.submit(load_page, page_id, file_data))
+                    )
+                    if len(loading) > IO_THREADS and not queue_page(*loading.popleft()):
+                        return
+                while loading:
+                    if not queue_page(*loading.popleft()):
+                        return
+            except BaseException as e:
+                ready.put((ALL_DONE, None, e))
+                return
+            ready.put((ALL_DONE, None, None))
+
+        # hands the blocks of a loaded page over to preprocessing and to the ready queue
+        def queue_page(page_id, loaded):
+            blocks = loaded.result()
+            if stop.is_set():
+                return False
+            if blocks == None:
+                ready.put((PAGE_FAILED, page_id, None))
+                return False
+            for block in blocks:
+                ready.put((page_id, block, cpu_pool.submit(preprocess, block)))
+            ready.put((PAGE_DONE, page_id, None))
+            return True
+
+        feeder = threading.Thread(target=feed, daemon=True)
+        feeder.start()
+
+        complete = True
+        try:
+            while True:
+                item, value, extra = ready.get()
+                if item == ALL_DONE:
+                    if extra != None:
+                        raise extra
+                    break
+                elif item == PAGE_FAILED:
+                    complete = False
+                    break
+                elif item == PAGE_DONE:
+                    finish_page(value)
+                else:
+                    extra.result()
+                    recognize(item, value)
+        finally:
+            # unblock the feeder, should recognition have stopped early
+            stop.set()
+            while feeder.is_alive():
+                try:
+                    ready.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            feeder.join()
+
+    return complete
+
+
+def run_stages(
+    pages: Iterable[Tuple[str, Dict[str, Any]]],
+    load_page: Callable[[str, Dict[str, Any]], Optional[List[Block]]],
+    recognize: Callable[[str, Block], None],
+    finish_page: Callable[[str], None],
+    threads: int,
+) -> bool:
+    """
+    Runs the stages of a single issue, pipelined if threads > 0 (see "run_pipelined") and serially otherwise.
+
+    Args:
+            pages (Iterable[Tuple[str, Dict[str, Any]]]): Page IDs together with their page information, in processing order.
+            load_page (Callable): Returns the blocks of a page that need new ocr (None if the page can't be processed).
+            recognize (Callable): Runs font and character recognition on a preprocessed block of a page.
+            finish_page (Callable): Called once all blocks of a page have been recognized.
+            threads (int): Number of threads used for binarization and segmentation, 0 for serial execution.
+
+    Returns:
+            bool: False if a page could not be loaded and the issue is incomplete, True otherwise.
+
+    Note:
+            With threads > 0, the callables run on different threads (see the threading contract of "run_pipelined").
+    """
+    if threads > 0:
+        return run_pipelined(pages, load_page, recognize, finish_page, threads)
+
+    for page_id, file_data in pages:
+        blocks = load_page(page_id, file_data)
+        if blocks == None:
+            return False
+        for block in blocks:
+            recognize(page_id, preprocess(block))
+        finish_page(page_id)
+    return True
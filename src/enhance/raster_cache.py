@@ -0,0 +1,124 @@
+import constants.constants as ct
+import os
+import cv2
+import hashlib
+import numpy as np
+from typing import Optional
+
+# folder of the decoded page rasters inside the cache directory
+RASTER_CACHE_FOLDER = "rasters"
+
+# share of the maximum size that is kept when evicting
+EVICTION_TARGET = 0.9
+
+
+def raster_name(image_path: str) -> str:
+    """
+    Returns the file name of the cached raster of a page image.
+
+    Args:
+            image_path (str): Path to the image file.
+
+    Returns:
+            str: '<path hash>-<version hash>.npy', the version hash covering modification time and size of the image.
+    """
+    stat = os.stat(image_path)
+    path_hash = hashlib.sha1(os.path.realpath(image_path).encode("utf-8")).hexdigest()
+    version = f"{stat.st_mtime_ns}-{stat.st_size}"
+    version_hash = hashlib.sha1(version.encode("utf-8")).hexdigest()[:16]
+    return path_hash + "-" + version_hash + ".npy"
+
+
+def load_raster(image_path: str) -> Optional[np.ndarray]:
+    """
+    Returns the decoded grayscale raster of a page image, memory-mapped from the raster cache.
+
+    Args:
+            image_path (str): Path to the image file.
+
+    Returns:
+            Optional[np.ndarray]: Read-only memory-mapped raster (the decoded image itself, should it exceed the
+            size of the cache), None if the image can't be read.
+
+    Note:
+            On a miss, the image is decoded entirely and stored as '.npy' file inside the 'rasters' folder of
+            ct.CACHE_PATH, replacing rasters of older versions of the same image. Crops of the returned raster are
+            zero-copy slices, only the pages of the file that are actually used are read. Rasters are invalidated
+            once the modification time or size of their image changes. The cache is limited to ct.RASTER_CACHE_SIZE MB.
+
+    Example:
+            >>> image = load_raster('/path/to/image.png')
+            >>> type(image)
+            <class 'numpy.memmap'>
+    """
+    if not os.path.isfile(image_path):
+        return None
+    directory = os.path.join(ct.CACHE_PATH, RASTER_CACHE_FOLDER)
+    name = raster_name(image_path)
+    path = os.path.join(directory, name)
+    if os.path.isfile(path):
+        try:
+            image = np.load(path, mmap_mode="r")
+            os.utime(path)
+            return image
+        except (OSError, ValueError):
+            print("ignoring unreadable cached raster " + path)
+
+    image = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    temp_path = os.path.join(directory, "tmp-" + str(os.getpid()) + "-" + name)
+    with open(temp_path, "wb") as raster_file:
+        np.save(raster_file, image)
+    os.replace(temp_path, path)
+
+    # older versions of the same image
+    path_hash = name.split("-")[0]
+    for f in os.listdir(directory):
+        if f.startswith(path_hash + "-") and f != name:
+            remove_raster(os.path.join(directory, f))
+
+    evict_rasters(directory, ct.RASTER_CACHE_SIZE * 1024 * 1024)
+    if not os.path.isfile(path):
+        return image
+    return np.load(path, mmap_mode="r")
+
+
+# removes a cached raster, which might already have been removed by another process
+def remove_raster(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def evict_rasters(directory: str, max_bytes: int) -> None:
+    """
+    Removes the least recently used rasters once the cache exceeds max_bytes, down to EVICTION_TARGET of max_bytes.
+
+    Args:
+            directory (str): Folder of the cached rasters.
+            max_bytes (int): Maximum size of the cached rasters.
+
+    Returns:
+            None
+    """
+    rasters = list()
+    total = 0
+    for f in os.listdir(directory):
+        if not f.endswith(".npy") or f.startswith("tmp-"):
+            continue
+        try:
+            stat = os.stat(os.path.join(directory, f))
+        except FileNotFoundError:
+            continue
+        rasters.append((stat.st_mtime, stat.st_size, f))
+        total += stat.st_size
+    if total <= max_bytes:
+        return
+    for _, size, f in sorted(rasters):
+        if total <= max_bytes * EVICTION_TARGET:
+            break
+        remove_raster(os.path.join(directory, f))
+        total -= size
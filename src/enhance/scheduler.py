@@ -0,0 +1,522 @@
+from enhance.pages_improve import (
+    cached_blocks_info,
+    count_ocr_lines,
+    count_triaged,
+    find_issues,
+    incomplete_issue,
+    load_enhance_models,
+    ocr_lines_info,
+    open_issue,
+    reused_pages_info,
+    select_blocks,
+    triaged_info,
+)
+from enhance.issue_parser import removed_types_info
+from enhance.epr_store import spell_counts, spell_info
+from enhance.manifest import Manifest
+from enhance.sidecar import Sidecar
+from enhance.page_parser import Block, process_pages_file
+from enhance.cost_model import estimate_cost, record_timings
+from enhance.image_cropper import crop_blocks, needed_rows, read_rows
+from epr.features_epr import Features
+from ocr.pipe.models import Models
+from ocr.pipe.pipe import ocr
+import os
+import io
+import copy
+import time
+import queue
+import contextlib
+import collections
+import traceback
+import multiprocessing
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+# markers sent by the worker processes instead of a task index
+WORKER_DONE = -1
+WORKER_FAILED = -2
+
+# number of decoded page images kept by every worker, tasks taken out of page order (stolen or ranked) reuse them
+IMAGES_KEPT = 4
+
+
+# class grouping the bookkeeping of a single issue while its blocks are distributed over the workers
+class IssueTasks:
+    """
+    Bookkeeping of a single issue whose blocks are processed as independent tasks.
+
+    Attributes:
+            issue_path (str): Path to the issue file.
+            ark (str): Name of the issue file.
+            blocks_info (Dict[str, Dict[str, Any]]): Pages information as returned by "parse_pages_structure".
+            copied_pages_directory (str): Output directory of the enhanced pages.
+            n_blocks (int): Total number of target blocks of the issue.
+            manifest (Manifest): Run manifest of the issue.
+            sidecar (Optional[Sidecar]): Sidecar receiving the new ocr results, None if full pages are written.
+            removed_types (Dict[str, int]): Number of blocks removed by the content item type filter per type.
+            outstanding (Dict[str, int]): Number of unfinished block tasks per page.
+            page_blocks (Dict[str, int]): Number of blocks that received new ocr per page.
+            processed_blocks (int): Number of blocks that received new ocr.
+            cached_blocks (int): Number of blocks whose ocr results were taken from the ocr cache.
+            ocr_lines (List[int]): Number of lines recognized again and of all lines of the blocks processed in line mode.
+            triaged (Dict[str, int]): Number of blocks dropped by the triage per reason.
+            skipped_blocks (int): Number of blocks that were not processed because the budget was exhausted.
+            skipped_pages (Set[str]): Pages with skipped blocks, not recorded as completed in the manifest.
+            failed_blocks (Dict[str, List[str]]): IDs of the blocks that failed per page, recorded in the manifest.
+            reused_pages (int): Number of pages completed by a previous run.
+            complete (bool): False if a block of the issue could not be processed.
+            before (int): Start time of the issue in ms.
+    """
+
+    def __init__(
+        self,
+        issue_path: str,
+        ark: str,
+        blocks_info: Dict[str, Dict[str, Any]],
+        copied_pages_directory: str,
+        n_blocks: int,
+        manifest: Manifest,
+        sidecar: Optional[Sidecar] = None,
+        removed_types: Optional[Dict[str, int]] = None,
+    ):
+        self.issue_path = issue_path
+        self.ark = ark
+        self.blocks_info = blocks_info
+        self.copied_pages_directory = copied_pages_directory
+        self.n_blocks = n_blocks
+        self.manifest = manifest
+        self.sidecar = sidecar
+        self.removed_types = removed_types if removed_types != None else dict()
+        self.outstanding = dict()
+        self.page_blocks = dict()
+        self.processed_blocks = 0
+        self.cached_blocks = 0
+        self.ocr_lines = [0, 0]
+        self.triaged = dict()
+        self.skipped_blocks = 0
+        self.skipped_pages = set()
+        self.failed_blocks = dict()
+        self.reused_pages = 0
+        self.complete = True
+        self.before = int(round(time.time() * 1000))
+
+    # records the new ocr results of a block in its page model or in the sidecar
+    def set_enhanced(self, page_id: str, block: Block) -> None:
+        if self.sidecar != None:
+            self.sidecar.add(page_id, block)
+        else:
+            self.blocks_info[page_id]["model"].set_enhanced(block)
+
+    # records a block of page_id that could not be processed, its page is not completed
+    def fail_block(self, page_id: str, block_id: str) -> None:
+        self.failed_blocks.setdefault(page_id, list()).append(block_id)
+        self.complete = False
+
+    # called once a block task of page_id is done (or skipped), writes the page and reports the issue when their last block is done
+    # (pages with failed blocks are recorded as such in the manifest, so that the next run retries them)
+    def finish_block(self, page_id: str, enhanced: bool, skipped: bool = False) -> None:
+        if enhanced:
+            self.processed_blocks += 1
+            self.page_blocks[page_id] = self.page_blocks.get(page_id, 0) + 1
+        if skipped:
+            self.skipped_blocks += 1
+            self.skipped_pages.add(page_id)
+        self.outstanding[page_id] -= 1
+        if self.outstanding[page_id] == 0:
+            page = self.blocks_info[page_id]["model"]
+            if self.sidecar != None:
+                self.sidecar.save()
+            elif page.modified:
+                page.write(os.path.join(self.copied_pages_directory, page_id))
+            if page_id in self.failed_blocks:
+                self.manifest.mark_failed(
+                    page_id, self.blocks_info[page_id], self.failed_blocks[page_id]
+                )
+            elif page_id not in self.skipped_pages:
+                self.manifest.mark_page(
+                    page_id, self.blocks_info[page_id], self.page_blocks.get(page_id, 0)
+                )
+            del self.outstanding[page_id]
+            if len(self.outstanding) == 0:
+                self.report()
+
+    # prints the summary line of the issue
+    def report(self) -> None:
+        if not self.complete:
+            incomplete_issue(self.issue_path)
+            return
+        status = " processed successfully in "
+        if self.skipped_blocks > 0:
+            status = " processed partially (budget exhausted) in "
+        else:
+            self.manifest.set_complete(True)
+        time_needed = int(round(time.time() * 1000)) - self.before
+        print(
+            self.ark
+            + status
+            + str(time_needed)
+            + " ms (new ocr for "
+            + str(self.processed_blocks)
+            + "/"
+            + str(self.n_blocks)
+            + " target blocks"
+            + skipped_blocks_info(self.skipped_blocks)
+            + cached_blocks_info(self.cached_blocks)
+            + ocr_lines_info(self.ocr_lines)
+            + triaged_info(self.triaged)
+            + removed_types_info(self.removed_types)
+            + reused_pages_info(self.reused_pages, len(self.blocks_info))
+            + ")"
+        )
+
+
+# summary information about blocks skipped because of the budget
+def skipped_blocks_info(skipped_blocks: int) -> str:
+    if skipped_blocks == 0:
+        return ""
+    return ", " + str(skipped_blocks) + " skipped"
+
+
+def expand_issues(
+    issues_paths: List[str],
+    models: Models,
+    features: Features,
+    required_epr: float,
+    force: bool = False,
+    sparse: bool = False,
+) -> Tuple[List[Tuple[str, str, str, int, Block]], Dict[str, IssueTasks]]:
+    """
+    Expands all issues into a flat list of block tasks that require new ocr.
+
+    Args:
+            issues_paths (List[str]): Paths to the issue files.
+            models (Models): Object containing the loaded enhancement prediction model.
+            features (Features): Object containing additional features.
+            required_epr (float): Enhancement prediction threshold for deciding which textblocks to process.
+            force (bool): Ignore the run manifests and reprocess all pages.
+            sparse (bool): Record the new ocr results in one sidecar per issue instead of copying all pages.
+
+    Returns:
+            Tuple[List[Tuple[str, str, str, int, Block]], Dict[str, IssueTasks]]: The block tasks, each consisting
+            of issue path, page ID, image path, number of image rows needed by the selected blocks of the page and
+            block (holding region, coordinates and enhancement prediction), together with the bookkeeping of every issue.
+
+    Note:
+            Images are not decoded at this stage, only text extraction and enhancement prediction are run.
+            Tasks are ordered by issue and page. Pages completed by a previous run (see "Manifest") are skipped,
+            pages without any eligible block are recorded as completed right away.
+    """
+    tasks = list()
+    issues = dict()
+    for issue_path in issues_paths:
+        issue = open_issue(issue_path, required_epr, force, sparse)
+        if issue == None:
+            continue
+        (
+            blocks_info,
+            n_blocks,
+            ark,
+            copied_pages_directory,
+            manifest,
+            sidecar,
+            removed_types,
+        ) = issue
+        issue_tasks = IssueTasks(
+            issue_path,
+            ark,
+            blocks_info,
+            copied_pages_directory,
+            n_blocks,
+            manifest,
+            sidecar,
+            removed_types,
+        )
+        for page_id, file_data in blocks_info.items():
+            if manifest.page_done(page_id, file_data):
+                issue_tasks.reused_pages += 1
+                continue
+            blocks_stuff = process_pages_file(
+                file_data["model"], file_data["blocks"], features, required_epr, models
+            )
+            selected = select_blocks(
+                blocks_stuff, page_id, ark, issue_path, required_epr
+            )
+            if len(selected) == 0:
+                manifest.mark_page(page_id, file_data, 0)
+                continue
+            issue_tasks.outstanding[page_id] = len(selected)
+            rows = needed_rows({block.block_id: block for block in selected})
+            for block in selected:
+                tasks.append((issue_path, page_id, file_data["image"], rows, block))
+        issues[issue_path] = issue_tasks
+        if len(issue_tasks.outstanding) == 0:
+            issue_tasks.report()
+    return tasks, issues
+
+
+# class holding the task queues of all workers in shared memory
+class TaskQueues:
+    """
+    Task queues shared by the worker processes, each queue being a contiguous part of one shared array.
+
+    Attributes:
+            items (Any): Task indices of all queues, queue after queue.
+            heads (Any): Position of the front of every queue in items.
+            tails (Any): Position after the back of every queue in items.
+            lock (Any): Lock protecting heads and tails.
+
+    Note:
+            Only task indices are queued, the workers take the tasks themselves from the task list inherited
+            from the main process (see "steal_blocks"). Taking a task only moves the front or back of a queue.
+    """
+
+    def __init__(self, ctx: Any, task_lists: List[List[int]]):
+        self.items = ctx.RawArray("i", [j for task_list in task_lists for j in task_list])
+        starts = list()
+        ends = list()
+        for task_list in task_lists:
+            starts.append(ends[-1] if ends else 0)
+            ends.append(starts[-1] + len(task_list))
+        self.heads = ctx.RawArray("i", starts)
+        self.tails = ctx.RawArray("i", ends)
+        self.lock = ctx.Lock()
+
+    # takes a task from the front of the own queue or, if it is empty, steals one from the back of the longest other queue
+    # (workers share the queues if there are fewer queues than workers), None once all queues are empty
+    def take(self, worker_index: int) -> Optional[int]:
+        with self.lock:
+            own = worker_index % len(self.heads)
+            if self.heads[own] < self.tails[own]:
+                self.heads[own] += 1
+                return self.items[self.heads[own] - 1]
+            victim = max(
+                range(len(self.heads)), key=lambda i: self.tails[i] - self.heads[i]
+            )
+            if self.heads[victim] == self.tails[victim]:
+                return None
+            self.tails[victim] -= 1
+            return self.items[self.tails[victim]]
+
+
+def steal_blocks(
+    worker_index: int,
+    tasks: List[Tuple[str, str, str, int, Block]],
+    queues: TaskQueues,
+    results: Any,
+    stop: Any,
+) -> None:
+    """
+    Worker process running ocr on block tasks until no task is left in any queue or stop is set.
+
+    Args:
+            worker_index (int): Index of the own task queue.
+            tasks (List[Tuple[str, str, str, int, Block]]): Block tasks, as returned by "expand_issues".
+            queues (TaskQueues): Shared task queues of all workers.
+            results (Any): Queue receiving (task index, (ocr, font, cached, triage), error, cpu seconds) tuples.
+            stop (Any): Event telling the worker to stop taking tasks.
+
+    Returns:
+            None
+
+    Note:
+            The models are loaded once per worker. The last IMAGES_KEPT decoded page images are kept, so that blocks
+            of the same page (the usual case for tasks of the own queue) only decode the page once. Page images are
+            only decoded down to the lowest selected block of the page (see "read_rows"). The task list is inherited
+            from the main process (fork), so blocks are never pickled; every task runs on a shallow copy of its block,
+            whose crops are released once the task is done.
+    """
+    log = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(log):
+            models = Models()
+            models.load_final_models(False)
+    except (Exception, SystemExit):
+        results.put(
+            (WORKER_FAILED, worker_index, log.getvalue() + traceback.format_exc(), 0)
+        )
+        return
+
+    images = collections.OrderedDict()
+    while not stop.is_set():
+        task_index = queues.take(worker_index)
+        if task_index == None:
+            break
+        _, _, task_image_path, rows, block = tasks[task_index]
+        block = copy.copy(block)
+        log = io.StringIO()
+        cpu_before = time.process_time()
+        try:
+            with contextlib.redirect_stdout(log):
+                if task_image_path not in images:
+                    images[task_image_path] = read_rows(task_image_path, rows)
+                    if len(images) > IMAGES_KEPT:
+                        images.popitem(last=False)
+                images.move_to_end(task_image_path)
+                image, height = images[task_image_path]
+                if image is None:
+                    raise IOError("couldn't read image at " + task_image_path)
+                if crop_blocks(image, task_image_path, {block.block_id: block}, height) == None:
+                    raise ValueError(log.getvalue().strip())
+                block = ocr(block, models)
+            value = (block.ocr, block.font, block.cached, block.triage)
+            results.put((task_index, value, None, time.process_time() - cpu_before))
+        except Exception:
+            error = log.getvalue() + traceback.format_exc()
+            results.put((task_index, None, error, time.process_time() - cpu_before))
+    results.put((WORKER_DONE, worker_index, None, 0))
+
+
+def run_tasks(
+    tasks: List[Tuple[str, str, str, int, Block]],
+    issues: Dict[str, IssueTasks],
+    task_lists: List[List[int]],
+    workers: int,
+    spent: Optional[Callable[[float], bool]] = None,
+) -> Set[int]:
+    """
+    Runs block tasks on worker processes and reassembles their results per page.
+
+    Args:
+            tasks (List[Tuple[str, str, str, int, Block]]): Block tasks, as returned by "expand_issues".
+            issues (Dict[str, IssueTasks]): Bookkeeping of every issue, as returned by "expand_issues".
+            task_lists (List[List[int]]): Indices of the tasks in processing order, one list (queue) per worker or
+                    a single list shared by all workers.
+            workers (int): Number of worker processes.
+            spent (Optional[Callable[[float], bool]]): Called with the cpu seconds of every finished task, the
+                    workers stop taking new tasks once it returns True.
+
+    Returns:
+            Set[int]: Indices of the tasks that were run (successfully or not).
+
+    Note:
+            Workers take tasks from the front of their own queue and steal from the back of the longest queue
+            once their own queue is empty (see "TaskQueues"). Every page is written as soon as its last block is done,
+            pages with failed blocks are recorded as such in the manifests and processed again by the next run.
+            The cpu seconds of every block that received new ocr are recorded to calibrate the cost model (see "record_timings").
+    """
+    ctx = multiprocessing.get_context("fork")
+    queues = TaskQueues(ctx, task_lists)
+    results = ctx.Queue()
+    stop = ctx.Event()
+
+    processes = [
+        ctx.Process(target=steal_blocks, args=(i, tasks, queues, results, stop))
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    done = set()
+    timings = list()
+    finished_workers = 0
+    while finished_workers < workers:
+        try:
+            task_index, value, error, seconds = results.get(timeout=1)
+        except queue.Empty:
+            if not any(process.is_alive() for process in processes):
+                break
+            if spent != None and spent(0):
+                stop.set()
+            continue
+
+        if task_index == WORKER_DONE:
+            finished_workers += 1
+            continue
+        elif task_index == WORKER_FAILED:
+            print("worker " + str(value) + " could not load models\n" + error)
+            finished_workers += 1
+            continue
+
+        done.add(task_index)
+        issue_path, page_id, _, _, block = tasks[task_index]
+        issue = issues[issue_path]
+        if error != None:
+            print("Block failed: " + block.block_id + " - alto: " + page_id + "\n" + error)
+            issue.fail_block(page_id, block.block_id)
+        else:
+            block.ocr, block.font, block.cached, block.triage = value
+            if not count_triaged(block, issue.triaged):
+                issue.cached_blocks += block.cached
+                count_ocr_lines(block, issue.ocr_lines)
+                if not block.cached:
+                    timings.append((block.cost_features, seconds))
+                issue.set_enhanced(page_id, block)
+        issue.finish_block(page_id, error == None and block.triage == None)
+        if spent != None and spent(seconds):
+            stop.set()
+
+    for process in processes:
+        process.join()
+    record_timings(timings)
+    return done
+
+
+# splits the tasks into contiguous parts of about the same estimated cost, one per worker
+def split_tasks(costs: List[float], workers: int) -> List[List[int]]:
+    total = sum(costs)
+    task_lists = [list() for _ in range(workers)]
+    cumulated = 0.0
+    for j, cost in enumerate(costs):
+        part = min(workers - 1, int((cumulated + cost / 2) * workers / total)) if total > 0 else 0
+        task_lists[part].append(j)
+        cumulated += cost
+    return task_lists
+
+
+# aims to enhance pages of the issues by running ocr on single blocks distributed over all workers
+def improve_blocks(
+    issues_directory: str,
+    required_epr: float,
+    workers: int,
+    force: bool = False,
+    sparse: bool = False,
+) -> None:
+    """
+    Enhances OCR quality for pages of issues in the specified directory, using block-granular scheduling.
+
+    Args:
+            issues_directory (str): Path to the directory containing the issues to be enhanced.
+            required_epr (float): Enhancement prediction threshold for deciding which textblocks to process.
+            workers (int): Number of worker processes.
+            force (bool): Ignore the run manifests of previous runs and reprocess all pages.
+            sparse (bool): Write one sidecar per issue with the new ocr results instead of full copies of the pages.
+
+    Returns:
+            None: The function does not return a value but saves enhanced results in a new directory.
+
+    Note:
+            All issues are first expanded into a flat list of block tasks (see "expand_issues"). The tasks are split
+            into contiguous parts of about the same estimated cost (see "estimate_cost"), one queue per worker. Every
+            worker takes tasks from the front of its own queue and, once it is empty, steals tasks from the back of
+            the longest queue of another worker, which keeps all workers busy until the end of the run. Results are
+            reassembled per page in the main process and every page is written as soon as its last block is done.
+
+    Example:
+            >>> improve_blocks('/path/to/issues', 0.02, 8)
+    """
+    issues_paths = find_issues(issues_directory)
+
+    # only the epr model is required to expand the issues, ocr models are loaded by the workers
+    models, features, required_epr = load_enhance_models(required_epr, False)
+    tasks, issues = expand_issues(
+        issues_paths, models, features, required_epr, force, sparse
+    )
+    print(
+        "expanded "
+        + str(len(issues_paths))
+        + " issues into "
+        + str(len(tasks))
+        + " block tasks"
+        + spell_info(spell_counts(features))
+    )
+
+    workers = max(1, workers)
+    costs = [estimate_cost(task[4].cost_features) for task in tasks]
+    run_tasks(tasks, issues, split_tasks(costs, workers), workers)
+
+    # issues with blocks that were never processed (all workers failed or crashed)
+    for issue in issues.values():
+        if len(issue.outstanding) > 0:
+            incomplete_issue(issue.issue_path)
+
+    print("\n Enhancements for all the issues completed")
@@ -0,0 +1,173 @@
+import constants.constants as ct
+import os
+from typing import Any, Iterator, Optional
+from enhance.page_model import Page, read_pages_jsonl
+from enhance.storage import (
+    dump_json,
+    is_jsonl_file,
+    is_page_file,
+    load_json,
+    strip_extension,
+)
+
+# suffix of the sidecar file name, following the issue ID
+SIDECAR_SUFFIX = "-enhanced"
+
+
+class Sidecar:
+    """
+    Sparse per-issue output, only holding the new ocr results instead of full copies of all pages.
+
+    Attributes:
+            path (str): Path to the sidecar file inside the "enhanced" folder of the issue.
+            data (Dict[str, Any]): Content of the sidecar, mapping page IDs to block names (region 'pOf' and
+                    block index, e.g. 'NZG-1881-10-01-a-i0030-block_1') to 'enhanced_text', 'predicted_font' and 'epr'.
+
+    Note:
+            The original text is not duplicated, "merge_sidecar" takes it from the original pages when merging.
+            The sidecar is written compactly and with the codec of ct.PAGE_EXTENSION.
+
+    Example:
+            >>> sidecar = Sidecar('/path/to/issue/enhanced', 'NZG-1881-10-01-a')
+            >>> sidecar.add('NZG-1881-10-01-a-p0001.json', block)
+            >>> sidecar.save()
+    """
+
+    def __init__(self, directory: str, issue_id: str):
+        self.path = find_sidecar(directory, issue_id)
+        if self.path == None:
+            self.path = os.path.join(
+                directory, issue_id + SIDECAR_SUFFIX + ct.PAGE_EXTENSION
+            )
+        self.data = {"id": issue_id, "pages": {}}
+        if os.path.isfile(self.path):
+            self.data = load_json(self.path)
+
+    def exists(self) -> bool:
+        return os.path.isfile(self.path)
+
+    # forgets about all results
+    def reset(self) -> None:
+        self.data["pages"] = {}
+
+    # forgets about the results of a single page
+    def remove_page(self, page_id: str) -> None:
+        self.data["pages"].pop(strip_extension(page_id), None)
+
+    def add(self, page_id: str, block: Any) -> None:
+        """
+        Records the new ocr results of a block.
+
+        Args:
+                page_id (str): Name of the page file the block belongs to.
+                block (Block): Processed block holding 'ocr', 'font' and 'enhance'.
+
+        Returns:
+                None
+        """
+        page_entries = self.data["pages"].setdefault(strip_extension(page_id), {})
+        page_entries[block.block_id] = {
+            "enhanced_text": block.ocr,
+            "predicted_font": block.font,
+            "epr": block.enhance,
+        }
+
+    # writes the sidecar atomically (the temporary file keeps the extension and thereby the codec)
+    def save(self) -> None:
+        directory, name = os.path.split(self.path)
+        os.makedirs(directory, exist_ok=True)
+        temp_path = os.path.join(directory, "tmp-" + name)
+        dump_json(self.data, temp_path, compact=True)
+        os.replace(temp_path, self.path)
+
+    def apply(self, page: Page) -> Page:
+        """
+        Merges the results of the sidecar into a page.
+
+        Args:
+                page (Page): Original page.
+
+        Returns:
+                Page: The page, its enhanced regions holding 'predicted_font', 'original_text' and 'enhanced_text'
+                as in the full page output, together with 'epr'.
+        """
+        for block_name, entry in self.data["pages"].get(page.id, {}).items():
+            if block_name not in page.regions:
+                print("block " + block_name + " of sidecar not found in page " + page.id)
+                continue
+            region = page.regions[block_name]
+            region["predicted_font"] = entry["predicted_font"]
+            region["original_text"] = page.get_text(block_name)
+            region["enhanced_text"] = entry["enhanced_text"]
+            region["epr"] = entry["epr"]
+            page.modified = True
+        return page
+
+
+# returns the path of an existing sidecar of an issue, in any of the supported formats
+def find_sidecar(directory: str, issue_id: str) -> Optional[str]:
+    if not os.path.isdir(directory):
+        return None
+    for f in sorted(os.listdir(directory)):
+        if is_page_file(f) and strip_extension(f) == issue_id + SIDECAR_SUFFIX:
+            return os.path.join(directory, f)
+    return None
+
+
+def merge_sidecar(issue_path: str) -> Iterator[Page]:
+    """
+    Reads the original pages of an issue and merges the results of its sidecar into them.
+
+    Args:
+            issue_path (str): Path to the issue file, next to the 'pages' folder and the 'enhanced' folder.
+
+    Returns:
+            Iterator[Page]: Original pages of the issue (from single page files or, if there are none, from the
+            pages JSONL files), with the new ocr results applied.
+
+    Example:
+            >>> for page in merge_sidecar('/path/to/issue/NZG-1881-10-01-a.json'):
+            ...     page.write('/path/to/merged/' + page.file_name)
+    """
+    issue_directory = os.path.dirname(issue_path)
+    issue_id = strip_extension(os.path.basename(issue_path))
+    sidecar = Sidecar(os.path.join(issue_directory, "enhanced"), issue_id)
+    if not sidecar.exists():
+        print("no sidecar found for issue " + issue_path)
+        return
+
+    pages_directory = os.path.join(issue_directory, "pages")
+    page_files = [f for f in sorted(os.listdir(pages_directory)) if is_page_file(f)]
+    if len(page_files) > 0:
+        for f in page_files:
+            yield sidecar.apply(Page(os.path.join(pages_directory, f)))
+    else:
+        for f in sorted(os.listdir(pages_directory)):
+            if is_jsonl_file(f):
+                for page in read_pages_jsonl(os.path.join(pages_directory, f)):
+                    yield sidecar.apply(page)
+
+
+def write_merged(issue_path: str) -> int:
+    """
+    Writes the original pages of an issue, merged with its sidecar, to the "enhanced/pages" folder of the issue.
+
+    Args:
+            issue_path (str): Path to the issue file.
+
+    Returns:
+            int: Number of written pages.
+
+    Note:
+            Pages read from a pages JSONL file are written as single page files.
+    """
+    output_directory = os.path.join(os.path.dirname(issue_path), "enhanced", "pages")
+    os.makedirs(output_directory, exist_ok=True)
+    n_pages = 0
+    for page in merge_sidecar(issue_path):
+        name = page.file_name
+        if not is_page_file(name) or page.path == name:
+            name = page.id + ct.PAGE_EXTENSION
+        page.write(os.path.join(output_directory, name))
+        n_pages += 1
+    return n_pages
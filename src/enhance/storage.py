@@ -0,0 +1,97 @@
+import constants.constants as ct
+import os
+import bz2
+import gzip
+import json
+from typing import Any, IO
+
+# codecs chosen through the file extension, uncompressed otherwise
+CODECS = {
+    ".gz": gzip,
+    ".bz2": bz2,
+}
+
+# page files can be stored uncompressed or compressed
+PAGE_EXTENSIONS = (".json", ".json.gz", ".json.bz2")
+
+# pages JSONL files can be stored uncompressed or compressed
+JSONL_EXTENSIONS = (".jsonl", ".jsonl.gz", ".jsonl.bz2")
+
+
+def open_text(path: str, mode: str) -> IO[str]:
+    """
+    Opens a (possibly compressed) text file, picking the codec from the file extension.
+
+    Args:
+            path (str): Path to the file, ending in '.gz' or '.bz2' for compressed files.
+            mode (str): 'r', 'w' or 'a'.
+
+    Returns:
+            IO[str]: Text file object.
+
+    Example:
+            >>> with open_text('/path/to/page.json.gz', 'r') as f:
+            ...     data = json.load(f)
+    """
+    codec = CODECS.get(os.path.splitext(path)[1])
+    if codec != None:
+        return codec.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def is_page_file(file_name: str) -> bool:
+    return file_name.endswith(PAGE_EXTENSIONS)
+
+
+def is_jsonl_file(file_name: str) -> bool:
+    return file_name.endswith(JSONL_EXTENSIONS)
+
+
+# removes '.json', '.json.gz', '.json.bz2', '.jsonl', ... from a file name
+def strip_extension(file_name: str) -> str:
+    for extension in JSONL_EXTENSIONS + PAGE_EXTENSIONS:
+        if file_name.endswith(extension):
+            return file_name[: -len(extension)]
+    return os.path.splitext(file_name)[0]
+
+
+def load_json(path: str) -> Any:
+    """
+    Loads a (possibly compressed) JSON file.
+
+    Args:
+            path (str): Path to a '.json', '.json.gz' or '.json.bz2' file.
+
+    Returns:
+            Any: Parsed content of the file.
+    """
+    with open_text(path, "r") as json_file:
+        return json.load(json_file)
+
+
+def dump_json(data: Any, path: str, compact: bool = None) -> None:
+    """
+    Writes data to a (possibly compressed) JSON file.
+
+    Args:
+            data (Any): Content to be written.
+            path (str): Path to a '.json', '.json.gz' or '.json.bz2' file.
+            compact (bool): Write without indentation and whitespace, defaults to ct.COMPACT_JSON.
+
+    Returns:
+            None
+    """
+    if compact == None:
+        compact = ct.COMPACT_JSON
+    with open_text(path, "w") as json_file:
+        if compact:
+            json.dump(data, json_file, ensure_ascii=False, separators=(",", ":"))
+        else:
+            json.dump(data, json_file, indent=2, ensure_ascii=False)
+
+
+# serializes a single record as line of a JSONL file
+def dumps_line(data: Any) -> str:
+    if ct.COMPACT_JSON:
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":")) + "\n"
+    return json.dumps(data, ensure_ascii=False) + "\n"
@@ -0,0 +1,54 @@
+import os
+import tempfile
+import cv2
+import numpy as np
+from PIL import Image
+from enhance.image_cropper import PARTIAL_DECODE_RATIO, read_rows
+
+# size of the random page images (rows, columns)
+IMAGE_SHAPE = (400, 300)
+
+
+# random PNG images of every color mode that is decoded partially, by name
+def random_images() -> dict:
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(0, 256, IMAGE_SHAPE + (4,), dtype=np.uint8)
+    return {
+        "L": Image.fromarray(pixels[:, :, 0]),
+        "LA": Image.fromarray(pixels).convert("LA"),
+        "1": Image.fromarray(pixels[:, :, 0]).convert("1"),
+        "RGB": Image.fromarray(pixels[:, :, :3]),
+        "RGBA": Image.fromarray(pixels),
+        "P": Image.fromarray(pixels[:, :, :3]).quantize(200),
+    }
+
+
+def test_read_rows() -> None:
+    """
+    Compares the partially decoded rows of PNG images with the rows of cv2.imread(..., cv2.IMREAD_GRAYSCALE).
+
+    Returns:
+        None
+
+    Note:
+        Palette images are also compared with a transparent color. The raster cache must be disabled.
+    """
+    rows = int(IMAGE_SHAPE[0] * PARTIAL_DECODE_RATIO) - 1
+    with tempfile.TemporaryDirectory() as directory:
+        compared = 0
+        for name, image in random_images().items():
+            for options in [{}, {"transparency": 3}] if name == "P" else [{}]:
+                path = os.path.join(directory, name + ".png")
+                image.save(path, **options)
+                expected = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+                for n_rows in [1, rows // 2, rows]:
+                    partial, height = read_rows(path, n_rows)
+                    assert height == IMAGE_SHAPE[0], name
+                    assert partial.shape == (n_rows, IMAGE_SHAPE[1]), name
+                    assert np.array_equal(partial, expected[:n_rows]), name
+                    compared += 1
+    print("identical rows for " + str(compared) + " partial decodes of PNG images")
+
+
+if __name__ == "__main__":
+    test_read_rows()
@@ -1,26 +1,9 @@
-import tensorflow as tf
-import numpy as np
+from epr.knn_epr import predict_batch
 
+# predicts the enhancement of a single block, leave_out_index excludes a training block (see "predict_batch")
 def predict(model, x_test, k, leave_out_index=None):
 
-	X = model['x']
-	Y = model['y']
-	chars = model['chars']
-
+	leave_out = None
 	if leave_out_index != None:
-		X = np.delete(X, (leave_out_index), axis=0)
-		Y = np.delete(Y, (leave_out_index), axis=0)
-		chars = np.delete(chars, (leave_out_index), axis=0)
-
-	total = 0
-	total_weight = 0
-
-	distances = tf.negative(tf.sqrt(tf.reduce_sum(tf.square(tf.subtract(X, x_test)), 1)))
-	_, indx = tf.nn.top_k(distances, k)
-	for index in indx.numpy():
-		flag = Y[index]
-		weight = chars[index]
-		total += flag*weight
-		total_weight += weight
-	
-	return total/total_weight
\ No newline at end of file
+		leave_out = [leave_out_index]
+	return predict_batch(model, [x_test], k, leave_out)[0]
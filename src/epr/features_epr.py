@@ -1,14 +1,96 @@
 from ocr.pipe.block import Block
+from epr.word_cache import dict_fingerprint, get_word_cache
 from langid.langid import LanguageIdentifier, model
+from collections import OrderedDict
 import hunspell
 import constants.constants as ct
+import threading
 import os
+import re
+
+# maximal runs of word characters except digits and '_': letters and a few numeric characters (e.g. '½')
+ALPHA_RUNS = re.compile(r'[^\W\d_]+')
+
+# a token: any character (a space or line break too) followed by characters up to the next space or line break, which
+# is left out
+TOKEN_PARTS = re.compile(r'(.[^ \n]*)[ \n]?', re.DOTALL)
+
+# tokens of a text (see Features.get_tokens) with their lowercased forms, so that a text is tokenized and lowercased
+# only once for all features
+class Tokens(list):
+
+	def __init__(self, tokens=(), lower=None):
+
+		super().__init__(tokens)
+		self.lower = [token.lower() for token in self] if lower == None else lower
+
+	# the tokens that are not empty (a single character that is not alphabetic gives an empty token)
+	def non_empty(self):
+
+		kept = [i for i in range(0, len(self)) if self[i] != '']
+		return Tokens([self[i] for i in kept], [self.lower[i] for i in kept])
+
+# lowercased forms of tokens, taken from Tokens or computed for a plain list
+def lower_tokens(tokens):
+
+	if isinstance(tokens, Tokens):
+		return tokens.lower
+	return [token.lower() for token in tokens]
+
+# number of tokens whose garbage rule results are kept by Features.get_garbage_scores
+GARBAGE_TOKENS = 200000
+
+# characters whose classes are computed when a lookup table is created, the others are classified on first use
+PRECOMPUTED_CHARS = 0x250
+
+# class of every character for the garbage rules (see Features.is_garbage), usable as table of str.translate:
+# 'v'/'V' lower/upper case vowel, 'c'/'C' lower/upper case consonant (letters that are not upper case count as
+# lower case), 'n' other alphanumeric character (digits, '½'), 's' special character
+class CharClasses(dict):
+
+	def __init__(self, vowels):
+
+		super().__init__()
+		self.vowels = vowels
+		for code in range(0, PRECOMPUTED_CHARS):
+			self[code]
+
+	def __missing__(self, code):
+
+		char = chr(code)
+		if char.isalpha():
+			char_class = 'v' if char.lower() in self.vowels else 'c'
+			if char.isupper():
+				char_class = char_class.upper()
+		elif char.isalnum():
+			char_class = 'n'
+		else:
+			char_class = 's'
+		self[code] = char_class
+		return char_class
+
+# lookup tables per set of vowels (ct.VOWELS is filled from config.ini)
+char_classes = dict()
+
+def get_char_classes():
+
+	vowels = frozenset(ct.VOWELS)
+	if not vowels in char_classes:
+		char_classes[vowels] = CharClasses(vowels)
+	return char_classes[vowels]
 
 class Features:
 
 	def __init__(self):
 
 		self.identifier = LanguageIdentifier.from_modelstring(model, norm_probs=True)
+		self.garbage_tokens = dict()
+		self.garbage_params = None
+		self.spelled = dict()
+		self.spell_lock = threading.Lock()
+		self.spell_lookups = 0
+		self.spell_hits = 0
+		self.dict_fingerprints = dict()
 		self.dicts = dict()
 		for lang in ct.SUPPORTED_LANGS:
 			aff_path = None
@@ -29,6 +111,7 @@ class Features:
 
 			if aff_path != None and dic_path != None:
 				self.dicts[lang] = hunspell.HunSpell(dic_path, aff_path)
+				self.dict_fingerprints[lang] = dict_fingerprint([dic_path, aff_path])
 			else:
 				words_list = set()
 				with open(txt_path, 'r', encoding='utf-8') as lines:
@@ -36,9 +119,11 @@ class Features:
 						words_list.add(line.lower().strip())
 				self.dicts[lang] = words_list
 
+	# dictionary and garbage score of the original text of a block, reusing its tokens if they were already computed
 	def compute_features_ori(self, block: Block):
 		
-		block.tokens_ori = self.get_tokens(block.ocr_ori)
+		if block.tokens_ori == None:
+			block.tokens_ori = self.get_tokens(block.ocr_ori)
 		block.dict_ori = self.get_dict_score(block.tokens_ori, block.lang_ori)
 		block.garbage_ori = self.get_garbage_score(block.tokens_ori)
 		return block
@@ -62,61 +147,79 @@ class Features:
 				
 		score = score/len(ngrams)
 		return score
+
+	# same score as "get_ngram_score", looking the ngrams up in the ranks of the language (see knn_epr.get_ngram_ranks,
+	# stored as 'ranks' in the epr model) instead of searching the list
+	def get_ranked_ngram_score(self, ngrams, ranks):
+
+		if len(ngrams) == 0:
+			return 0
+
+		score = 0
+		for ngram in ngrams:
+			score += ranks.get(ngram, 0)
+
+		score = score/len(ngrams)
+		return score
 		
 
 	def get_ngrams(self, tokens, text):
 
 		lang_gt = self.get_lang(tokens, text)
+		return (lang_gt, self.get_trigrams(tokens))
+
+	# character ngrams of the alphabetic parts of the tokens (without language identification)
+	# - the alphabetic parts are found by a single regex pass over all tokens, the rare parts holding numeric characters
+	#   like '½' (matched by ALPHA_RUNS but not alphabetic) are split again
+	# - a part is lowercased at once unless lowercasing changes its length or depends on the context (final sigma),
+	#   so that the ngrams equal the lowercased slices of the part
+	def get_trigrams(self, tokens):
+
+		n = ct.NGRAM_LENGTH
 		n_grams = list()
-		for token in tokens:
-			token_list = list(token)
-			for i in range(0,len(token_list)):
-				if not token[i].isalpha():
-					token_list[i] = " "
-			modified_token = "".join(token_list)
-			splits = modified_token.split(" ")
+		for run in ALPHA_RUNS.findall(' '.join(tokens)):
+			splits = [run]
+			if not run.isalpha():
+				splits = ''.join([c if c.isalpha() else ' ' for c in run]).split()
 			for split in splits:
-				if split != "":
-					for i in range(0, len(split)-ct.NGRAM_LENGTH+1):
-						n_grams.append(split[i:i+ct.NGRAM_LENGTH].lower())
-		return (lang_gt, n_grams)
+				lower = split.lower()
+				if len(lower) == len(split) and not 'Σ' in split:
+					n_grams.extend([lower[i:i+n] for i in range(0, len(split)-n+1)])
+				else:
+					n_grams.extend([split[i:i+n].lower() for i in range(0, len(split)-n+1)])
+		return n_grams
 
+	# tokens of a text in a single regex pass (see TOKEN_PARTS), as Tokens holding their lowercased forms
+	# - words hyphenated at line breaks are joined first, a hyphen directly followed by a line break being removed
+	#   together with it (repeatedly, as joining can bring another hyphen before a line break)
+	# - a space or line break ends a token, unless the token is empty, then it is part of the next token
+	# - a first character that is not alphabetic is removed, otherwise a last character that is not alphabetic
 	def get_tokens(self, text):
 
-		tokens = list()
-
-		new_token = ''
-		for c in text:
-			if c == ' ' and len(new_token) > 0:
-				tokens.append(new_token)
-				new_token = ''
-			elif c == '\n' and len(new_token) > 0:
-				if new_token[-1] in ct.HYPHENS:
-					new_token = new_token[:-1]
-				else:
-					tokens.append(new_token)
-					new_token = ''
-			else:
-				new_token += c
-		if len(new_token) > 0:
-			tokens.append(new_token)
+		line_breaks = re.compile('[' + ''.join([re.escape(h) for h in sorted(ct.HYPHENS)]) + ']\n')
+		joined = 1
+		while joined > 0:
+			text, joined = line_breaks.subn('', text)
 
-		for i, token in enumerate(tokens):
-			if not token[-1].isalpha():
-				tokens[i] = token[:-1]
+		tokens = list()
+		for token in TOKEN_PARTS.findall(text):
 			if not token[0].isalpha():
-				tokens[i] = token[1:]
-
-		return tokens
+				token = token[1:]
+			elif not token[-1].isalpha():
+				token = token[:-1]
+			tokens.append(token)
+		return Tokens(tokens)
 
 	def get_lang(self, tokens, text):
 
 		if len(tokens) == 0:
 			return 'unknown'
+		lower = lower_tokens(tokens)
 		for lang in ct.SUPPORTED_LANGS:
+			stop_words = set([sw.lower() for sw in ct.STOP_WORDS[lang]])
 			matched = 0
-			for token in tokens:
-				if token.lower() in [sw.lower() for sw in ct.STOP_WORDS[lang]]:
+			for token in lower:
+				if token in stop_words:
 					matched += 1
 			if matched/len(tokens) >= ct.STOP_WORDS_THRESH:
 				return lang
@@ -134,129 +237,153 @@ class Features:
 		matched_count = 0
 		total_count = 0
 
-		for token in tokens:
-			total_count += len(token)
-			if isinstance(self.dicts[lang], set):
-				if token.lower() in self.dicts[lang]:
+		words = self.dicts[lang]
+		if isinstance(words, set):
+			for token, lower in zip(tokens, lower_tokens(tokens)):
+				total_count += len(token)
+				if lower in words:
 					matched_count += len(token)
-			else:
-				if self.dicts[lang].spell(token):
+		else:
+			for token, valid in zip(tokens, self.spell(tokens, lang)):
+				total_count += len(token)
+				if valid:
 					matched_count += len(token)
 		return matched_count/total_count
 
+	# whether words are in the hunspell dictionary of a language, looked up in order:
+	# - the last SPELL_CACHE_SIZE words of the language checked by this process (newspaper text repeats the same words)
+	# - the word cache if enabled (see "WordCache"), warmed up by earlier runs and the other worker processes
+	# - hunspell
+	# words of a word list dictionary are looked up in the set directly (see "get_dict_score")
+	def spell(self, words, lang):
+
+		with self.spell_lock:
+			spelled = self.spelled.setdefault(lang, OrderedDict())
+			missing = dict()
+			for word in words:
+				if word in spelled:
+					spelled.move_to_end(word)
+					self.spell_hits += 1
+				elif word in missing:
+					self.spell_hits += 1
+				else:
+					missing[word] = None
+			self.spell_lookups += len(words)
+
+			if len(missing) > 0:
+				cache = get_word_cache()
+				if cache != None:
+					missing.update(cache.get(lang, self.dict_fingerprints[lang], list(missing)))
+				checked = dict()
+				for word in missing:
+					if missing[word] == None:
+						checked[word] = self.dicts[lang].spell(word)
+						missing[word] = checked[word]
+				if cache != None and len(checked) > 0:
+					cache.put(lang, self.dict_fingerprints[lang], checked)
+
+			results = [spelled[word] if word in spelled else missing[word] for word in words]
+			for word in missing:
+				spelled[word] = missing[word]
+			while len(spelled) > ct.SPELL_CACHE_SIZE:
+				spelled.popitem(last=False)
+			return results
+
+	# numbers of spell checks so far: lookups, lookups answered from memory, lookups in the word cache, words found in
+	# the word cache (see "spell")
+	def spell_counts(self):
 
+		cache = get_word_cache()
+		if cache == None:
+			return [self.spell_lookups, self.spell_hits, 0, 0]
+		return [self.spell_lookups, self.spell_hits, cache.lookups, cache.hits]
+
+	# writes the spell checks pending for the word cache
+	def save_words(self):
+
+		cache = get_word_cache()
+		if cache != None:
+			cache.flush()
+
+	# share of the tokens violating one of the garbage rules, see "get_garbage_scores"
 	def get_garbage_score(self, tokens):
 
-		issues = 0
+		return self.get_garbage_scores([tokens])[0]
 
-		if len(tokens) == 0:
-			return 0
-						
-		for token in tokens:
-		
-			# rule1
-			if len(token) >= ct.EPR_RULE1:
-				issues += 1
-				continue
-				
-			vowel_count = 0
-			consonant_count = 0
-			lower_case_count = 0
-			upper_case_count = 0
-			special_char_count = 0
-			non_outer_special_chars = set()
-			alpha = True
-			last_char = None
-			repitition_streak = 0
-			vowel_streak = 0
-			consonant_streak = 0
-			go_to_next_token = False
-			for i in range(0, len(token)):
-				go_to_next_token = False
-				char = token[i]
-				
-				# collect token info
-				if char.isalpha():
-					if char.lower() in ct.VOWELS:
-						vowel_count += 1
-						vowel_streak += 1
-						consonant_streak = 0
-					else:
-						consonant_count += 1
-						consonant_streak += 1
-						vowel_streak = 0
-					if char.isupper():
-						upper_case_count += 1
-					else:
-						lower_case_count += 1
-				elif char.isalnum():
-					alpha = False
-					vowel_streak = 0
-					consonant_streak = 0
-				else:
-					special_char_count += 1
-					alpha = False
-					vowel_streak = 0
-					consonant_streak = 0
-					if i != 0 and i != len(token)-1:
-						non_outer_special_chars.add(char)
-
-				# rule 3
-				if vowel_streak >= ct.EPR_RULE3:
-					issues += 1
-					go_to_next_token = True
-					break
+	# garbage scores of many blocks at once (one list of tokens per block, e.g. all blocks of a page)
+	# - every distinct token is checked once (see "is_garbage"), the results are kept for the next pages (at most
+	#   GARBAGE_TOKENS tokens, forgotten if the vowels or rules change)
+	# - the streak rules run as one regex search over the character classes of a token (see "CharClasses"), the
+	#   repetition rule as one regex search over the token itself
+	def get_garbage_scores(self, token_lists):
 
-				# rule 4
-				if consonant_streak >= ct.EPR_RULE4:
-					issues += 1
-					go_to_next_token = True
-					break
-				
-				if last_char != None and char == last_char:
-					repitition_streak += 1
-
-					# rule 2
-					if repitition_streak >= ct.EPR_RULE2:
-						issues += 1
-						go_to_next_token = True
-						break
-				else:
-					repitition_streak = 0
-				last_char = char
-			
-			if go_to_next_token:
-				continue
-			
-			if alpha and vowel_count>0 and consonant_count>0:
-				# rule 5		
-				if vowel_count*ct.EPR_RULE5 < consonant_count:
-					issues += 1
-					continue
-				# rule 5
-				if consonant_count*ct.EPR_RULE5 < vowel_count:
-					issues += 1
-					continue
-			
-			# rule 6
-			if lower_case_count > 0 and upper_case_count > lower_case_count:
-				issues += 1
+		classes = get_char_classes()
+		streaks = re.compile('[vV]{%d}|[cC]{%d}' % (ct.EPR_RULE3, ct.EPR_RULE4))
+		repetitions = re.compile(r'(.)\1{%d}' % max(ct.EPR_RULE2, 1), re.DOTALL)
+		params = (classes.vowels, ct.EPR_RULE1, ct.EPR_RULE2, ct.EPR_RULE3, ct.EPR_RULE4, ct.EPR_RULE5, ct.EPR_RULE9)
+		if params != self.garbage_params or len(self.garbage_tokens) > GARBAGE_TOKENS:
+			self.garbage_tokens = dict()
+			self.garbage_params = params
+		garbage = self.garbage_tokens
+		scores = list()
+		for tokens in token_lists:
+			if len(tokens) == 0:
+				scores.append(0)
 				continue
+			issues = 0
+			for token in tokens:
+				if not token in garbage:
+					garbage[token] = self.is_garbage(token, classes, streaks, repetitions)
+				issues += garbage[token]
+			scores.append(issues/len(tokens))
+		return scores
 
-			# rule 7
-			if upper_case_count > 0 and token[0].islower() and token[len(token)-1].islower():
-				issues += 1
-				continue
+	# whether a token violates one of the garbage rules:
+	# 1: at least EPR_RULE1 characters
+	# 2: a character repeated more than EPR_RULE2 times in a row
+	# 3, 4: at least EPR_RULE3 vowels or EPR_RULE4 consonants in a row
+	# 5: only letters, with EPR_RULE5 times more consonants than vowels or vice versa
+	# 6: more upper than lower case letters (at least one lower case letter)
+	# 7: upper case letters inside a token starting and ending in lower case
+	# 8: at least as many special characters as other characters (at least one other character)
+	# 9: at least EPR_RULE9 different special characters inside the token (not first or last)
+	def is_garbage(self, token, classes, streaks, repetitions):
 
-			# rule 8
-			regular_chars = len(token)-special_char_count
-			if special_char_count >= regular_chars and regular_chars > 0:
-				issues += 1
-				continue
-			
-			# rule 9
-			if len(non_outer_special_chars) >= ct.EPR_RULE9:
-				issues += 1
-				continue
+		if len(token) >= ct.EPR_RULE1:
+			return True
+
+		token_classes = token.translate(classes)
+		if streaks.search(token_classes) != None or repetitions.search(token) != None:
+			return True
+
+		lower_vowels = token_classes.count('v')
+		upper_vowels = token_classes.count('V')
+		lower_consonants = token_classes.count('c')
+		upper_consonants = token_classes.count('C')
+		vowel_count = lower_vowels + upper_vowels
+		consonant_count = lower_consonants + upper_consonants
+		lower_case_count = lower_vowels + lower_consonants
+		upper_case_count = upper_vowels + upper_consonants
+		special_char_count = token_classes.count('s')
+
+		alpha = vowel_count + consonant_count == len(token)
+		if alpha and vowel_count > 0 and consonant_count > 0:
+			if vowel_count*ct.EPR_RULE5 < consonant_count or consonant_count*ct.EPR_RULE5 < vowel_count:
+				return True
+
+		if lower_case_count > 0 and upper_case_count > lower_case_count:
+			return True
+
+		if upper_case_count > 0 and token[0].islower() and token[-1].islower():
+			return True
+
+		regular_chars = len(token)-special_char_count
+		if special_char_count >= regular_chars and regular_chars > 0:
+			return True
+
+		if token_classes.count('s', 1, len(token)-1) >= ct.EPR_RULE9:
+			inner_chars = set([c for c, c_class in zip(token[1:-1], token_classes[1:-1]) if c_class == 's'])
+			if len(inner_chars) >= ct.EPR_RULE9:
+				return True
 
-		return issues/len(tokens)
\ No newline at end of file
+		return False
\ No newline at end of file
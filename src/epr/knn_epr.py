@@ -0,0 +1,112 @@
+import os
+import json
+import numpy as np
+import constants.constants as ct
+
+# number of blocks whose distances to the model points are computed at once
+PREDICT_CHUNK = 128
+
+# returns the path of the epr model stored in /models/final/, None if there is none
+def find_epr_model():
+	for root, _, files in sorted(os.walk(ct.MODELS_PATH + 'final/')):
+		for f in sorted(files):
+			if f.endswith('.jsonl'):
+				return root + '/' + f
+	return None
+
+# score of every ngram of a language (position in the list, the first occurrence counts), so that the trigram score
+# of a block only looks its ngrams up (see Features.get_ranked_ngram_score)
+def get_ngram_ranks(lang_ngrams):
+
+	ranks = dict()
+	for i in range(0, len(lang_ngrams)):
+		if not lang_ngrams[i] in ranks:
+			ranks[lang_ngrams[i]] = 1-(1/len(lang_ngrams)*i)
+	return ranks
+
+# reads an epr model (first line: trigrams per language, then one line per training block and a line holding k)
+# without tensorflow or kraken, the ranks of the trigrams of every language are computed once (see "get_ngram_ranks")
+def read_epr_model(path):
+	x_values = list()
+	y_values = list()
+	chars = list()
+	trigrams = dict()
+	k = None
+	counter = 0
+	with open(path, 'r', encoding='utf-8') as lines:
+		for line in lines:
+			counter += 1
+			info = json.loads(line)
+
+			# load language trigrams
+			if counter == 1:
+				trigrams = info
+				model_langs = set([k for k in trigrams])
+				target_langs = set(ct.SUPPORTED_LANGS)
+				if not model_langs == target_langs:
+					print("warning: epr model languages don't match supported languages in config.ini")
+			# load models
+			elif 'k' in info:
+				k = info['k']
+			else:
+				x_values.append(info['x'])
+				y_values.append(info['y'])
+				chars.append(info['chars'])
+
+	model = {
+		'x': np.array(x_values),
+		'y': np.array(y_values),
+		'chars': np.array(chars),
+		'trigrams': trigrams,
+		'ranks': {lang: get_ngram_ranks(trigrams[lang]) for lang in trigrams},
+		'k': k
+	}
+
+	return model
+
+# predicts the enhancement of many blocks at once (one row of x_test per block): average of the flags of the k nearest
+# training blocks weighted by their number of characters, ties in distance being resolved in favour of the training
+# block stored first
+# - leave_out optionally holds one training block index per row of x_test, which is not considered for that row
+#   (leave-one-out evaluation of the model, see test_epr)
+# - the training set holds a few thousand blocks of 4 features, so that the distances to all of them are computed
+#   by brute force in chunks of PREDICT_CHUNK blocks
+def predict_batch(model, x_test, k, leave_out=None):
+
+	X = model['x']
+	Y = model['y']
+	chars = model['chars']
+	x_test = np.asarray(x_test, dtype=X.dtype).reshape(-1, X.shape[1])
+	k = min(k, len(X) if leave_out is None else len(X)-1)
+
+	if leave_out is not None:
+		leave_out = np.asarray(leave_out)
+
+	predictions = np.empty(len(x_test))
+	for start in range(0, len(x_test), PREDICT_CHUNK):
+		chunk = x_test[start:start+PREDICT_CHUNK]
+		rows = np.arange(len(chunk))[:, None]
+		distances = np.zeros((len(chunk), len(X)))
+		for j in range(X.shape[1]):
+			difference = np.subtract(X[:, j], chunk[:, j, None])
+			np.multiply(difference, difference, out=difference)
+			distances += difference
+		np.sqrt(distances, out=distances)
+		if leave_out is not None:
+			distances[rows[:, 0], leave_out[start:start+PREDICT_CHUNK]] = np.inf
+
+		# the k nearest training blocks, unique unless further training blocks are tied with the k-th one
+		neighbours = np.sort(np.argpartition(distances, k-1, axis=1)[:, :k], axis=1)
+		kth = np.max(distances[rows, neighbours], axis=1)
+		for row in np.nonzero(np.count_nonzero(distances <= kth[:, None], axis=1) > k)[0]:
+			closer = np.nonzero(distances[row] < kth[row])[0]
+			tied = np.nonzero(distances[row] == kth[row])[0]
+			neighbours[row] = np.concatenate([closer, tied[:k-len(closer)]])
+
+		# summed up in order of distance like the former tensorflow top_k, so that rounding is the same
+		order = np.argsort(distances[rows, neighbours], axis=1, kind='stable')
+		neighbours = neighbours[rows, order]
+		total = np.cumsum(Y[neighbours] * chars[neighbours], axis=1)[:, -1]
+		total_weight = np.cumsum(chars[neighbours], axis=1)[:, -1]
+		predictions[start:start+len(chunk)] = total/total_weight
+	return predictions
@@ -1,6 +1,7 @@
 import json
 from ocr.pipe.models import Models
-from epr.apply_epr import predict
+from epr.knn_epr import predict_batch
+import numpy as np
 import constants.constants as ct
 import os
 from tqdm import tqdm
@@ -19,14 +20,15 @@ def test_epr_model(model_name):
 
 	n_test_ks = int(len(X)**(1/2))
 	
+	# leave-one-out predictions of all training blocks, computed in one batch per k
 	for k in tqdm([i for i in range(1, min(len(X), n_test_ks*2), 2)]):
 		total_loss = 0
 		total_chars = 0
+		predictions = predict_batch(models.epr, X, k, np.arange(len(X)))
 		for i in range(0, len(X)):
 			
-			x_test = X[i]
 			gt = Y[i]
-			prediction = predict(models.epr, x_test, k, i)
+			prediction = predictions[i]
 			delta = prediction-gt
 			diff = abs(delta)
 			total_loss += diff*chars[i]
@@ -0,0 +1,171 @@
+import os
+import random
+from pathlib import Path
+from epr.features_epr import Features
+from enhance.page_model import Page
+import constants.constants as ct
+
+# issues of the NZG example, whose region and line texts are compared
+NZG_SAMPLES_PATH = str(Path(__file__).parent.parent.parent.absolute()) + '/data/s3_data/'
+
+# number of random token lists compared in addition to the NZG texts
+N_RANDOM_TOKEN_LISTS = 20000
+
+# characters of the random tokens: vowels, consonants, upper case, digits, numeric letters, punctuation and whitespace
+RANDOM_CHARS = list('aeiouyAEIOUYäöüÄÖÜéèbcdfghklmnpqrstvwxzBCDFGHKLMNPRSTßİΣ0123456789½²-.,;:!?\'"()/_ \n\t')
+
+# garbage score of a list of tokens checking the rules character by character, as done before the batched
+# implementation (see Features.get_garbage_scores)
+def reference_garbage_score(tokens):
+
+	issues = 0
+
+	if len(tokens) == 0:
+		return 0
+
+	for token in tokens:
+
+		# rule1
+		if len(token) >= ct.EPR_RULE1:
+			issues += 1
+			continue
+
+		vowel_count = 0
+		consonant_count = 0
+		lower_case_count = 0
+		upper_case_count = 0
+		special_char_count = 0
+		non_outer_special_chars = set()
+		alpha = True
+		last_char = None
+		repitition_streak = 0
+		vowel_streak = 0
+		consonant_streak = 0
+		go_to_next_token = False
+		for i in range(0, len(token)):
+			go_to_next_token = False
+			char = token[i]
+
+			# collect token info
+			if char.isalpha():
+				if char.lower() in ct.VOWELS:
+					vowel_count += 1
+					vowel_streak += 1
+					consonant_streak = 0
+				else:
+					consonant_count += 1
+					consonant_streak += 1
+					vowel_streak = 0
+				if char.isupper():
+					upper_case_count += 1
+				else:
+					lower_case_count += 1
+			elif char.isalnum():
+				alpha = False
+				vowel_streak = 0
+				consonant_streak = 0
+			else:
+				special_char_count += 1
+				alpha = False
+				vowel_streak = 0
+				consonant_streak = 0
+				if i != 0 and i != len(token)-1:
+					non_outer_special_chars.add(char)
+
+			# rule 3
+			if vowel_streak >= ct.EPR_RULE3:
+				issues += 1
+				go_to_next_token = True
+				break
+
+			# rule 4
+			if consonant_streak >= ct.EPR_RULE4:
+				issues += 1
+				go_to_next_token = True
+				break
+
+			if last_char != None and char == last_char:
+				repitition_streak += 1
+
+				# rule 2
+				if repitition_streak >= ct.EPR_RULE2:
+					issues += 1
+					go_to_next_token = True
+					break
+			else:
+				repitition_streak = 0
+			last_char = char
+
+		if go_to_next_token:
+			continue
+
+		if alpha and vowel_count>0 and consonant_count>0:
+			# rule 5
+			if vowel_count*ct.EPR_RULE5 < consonant_count:
+				issues += 1
+				continue
+			# rule 5
+			if consonant_count*ct.EPR_RULE5 < vowel_count:
+				issues += 1
+				continue
+
+		# rule 6
+		if lower_case_count > 0 and upper_case_count > lower_case_count:
+			issues += 1
+			continue
+
+		# rule 7
+		if upper_case_count > 0 and token[0].islower() and token[len(token)-1].islower():
+			issues += 1
+			continue
+
+		# rule 8
+		regular_chars = len(token)-special_char_count
+		if special_char_count >= regular_chars and regular_chars > 0:
+			issues += 1
+			continue
+
+		# rule 9
+		if len(non_outer_special_chars) >= ct.EPR_RULE9:
+			issues += 1
+			continue
+
+	return issues/len(tokens)
+
+# compares the batched garbage scores with the reference implementation on the tokens of every region and line of the
+# NZG example (one batch per page, as computed by page_features) and on random token lists, requires the config to be
+# read (vowels)
+def test_garbage_scores(samples_path=NZG_SAMPLES_PATH):
+
+	features = Features()
+	token_lists = list()
+	for root, _, files in sorted(os.walk(samples_path)):
+		for f in sorted(files):
+			if f.endswith('.json') and os.path.basename(root) == 'pages':
+				page = Page(os.path.join(root, f))
+				page_tokens = list()
+				for block_name in page.regions:
+					page_tokens.append(features.get_tokens(page.get_text(block_name)))
+					for _, text in page.get_lines(block_name):
+						page_tokens.append(features.get_tokens(text))
+				expected = [reference_garbage_score(tokens) for tokens in page_tokens]
+				assert features.get_garbage_scores(page_tokens) == expected, f
+				token_lists.extend(page_tokens)
+	assert len(token_lists) > 0, 'no page files found in ' + samples_path
+
+	# single blocks, answered from the results kept for the pages
+	for tokens in token_lists:
+		assert features.get_garbage_score(tokens) == reference_garbage_score(tokens)
+
+	random.seed(0)
+	random_token_lists = list()
+	for _ in range(0, N_RANDOM_TOKEN_LISTS):
+		random_token_lists.append([''.join([random.choice(RANDOM_CHARS) for _ in range(random.randint(0, 25))]) for _ in range(random.randint(0, 30))])
+	assert features.get_garbage_scores(random_token_lists) == [reference_garbage_score(tokens) for tokens in random_token_lists]
+
+	print('identical garbage scores for ' + str(len(token_lists)) + ' token lists of the NZG example and ' + str(len(random_token_lists)) + ' random token lists')
+
+if __name__ == '__main__':
+	from main import read_config
+	read_config()
+	test_garbage_scores()
@@ -1,4 +1,5 @@
 from epr.features_epr import Features
+from epr.knn_epr import get_ngram_ranks
 from ocr.test.scoring import Scoring
 from ocr.test.test_ocr import get_alto_text
 from ocr.pipe.block import Block
@@ -27,8 +28,9 @@ def train_epr_model(inventory, model_name):
 		lang_ngrams[lang] = [n[0] for n in lang_ngrams[lang]]
 	
 	# we replace x[1] from language information to trigram score
+	lang_ranks = {lang: get_ngram_ranks(lang_ngrams[lang]) for lang in lang_ngrams}
 	for i, _ in enumerate(X):
-		X[i][1] = features.get_ngram_score(trigrams[i], lang_ngrams[X[i][1]])
+		X[i][1] = features.get_ranked_ngram_score(trigrams[i], lang_ranks[X[i][1]])
 
 	if not os.path.isdir(ct.MODELS_PATH):
 		os.makedirs(ct.MODELS_PATH)
@@ -96,7 +98,7 @@ def get_data(inventory, models, scoring, features):
 				print("'year' property is not of type integer")
 				exit()
 
-			image = cv2.imread(info['image'])
+			image = cv2.imread(info['image'], cv2.IMREAD_GRAYSCALE)
 			block = Block(image)
 
 			# set gt ocr
@@ -0,0 +1,85 @@
+import os
+import hashlib
+import constants.constants as ct
+from ocr.pipe.sqlite_store import SqliteStore
+
+# name of the sqlite database inside the cache directory
+WORD_CACHE_NAME = 'words.sqlite'
+
+# new words are written once this many are pending
+WORD_CACHE_FLUSH = 1000
+
+# number of words looked up by one query (below the sqlite limit of host parameters)
+WORD_CACHE_QUERY = 500
+
+# persistent cache of spell checks: whether a word is in the hunspell dictionary of a language
+# - every word is stored with a fingerprint of the dictionary files of its language (see "dict_fingerprint"), words
+#   checked with other dictionary files are not used
+# - new words are written in batches of WORD_CACHE_FLUSH words and by "flush" (after every page)
+# - shared by forked workers, which warm up the same cache (see "SqliteStore")
+class WordCache(SqliteStore):
+
+	def __init__(self, directory):
+		super().__init__(os.path.join(directory, WORD_CACHE_NAME), [
+			'CREATE TABLE IF NOT EXISTS words (lang TEXT, word TEXT, dict TEXT, valid INTEGER, PRIMARY KEY (lang, word))'
+		])
+		self.pending = list()
+		self.hits = 0
+		self.lookups = 0
+
+	# words pending in the parent process are written by the parent
+	def opened(self):
+		self.pending = list()
+
+	# returns the stored results of words of a language as word -> valid, words that are not stored are left out
+	def get(self, lang, fingerprint, words):
+		found = dict()
+		with self.lock:
+			connection = self.connect()
+			for start in range(0, len(words), WORD_CACHE_QUERY):
+				chunk = words[start:start+WORD_CACHE_QUERY]
+				rows = connection.execute('SELECT word, valid FROM words WHERE lang = ? AND dict = ? AND word IN (' + ','.join(['?'] * len(chunk)) + ')', [lang, fingerprint] + chunk)
+				for word, valid in rows:
+					found[word] = valid == 1
+			self.lookups += len(words)
+			self.hits += len(found)
+		return found
+
+	# stores the results of words of a language given as word -> valid
+	def put(self, lang, fingerprint, results):
+		with self.lock:
+			self.connect()
+			self.pending.extend([(lang, word, fingerprint, 1 if valid else 0) for word, valid in results.items()])
+			if len(self.pending) >= WORD_CACHE_FLUSH:
+				self.write()
+
+	def flush(self):
+		with self.lock:
+			if len(self.pending) > 0:
+				self.write()
+
+	# writes the pending words (called holding the lock)
+	def write(self):
+		connection = self.connect()
+		connection.executemany('INSERT OR REPLACE INTO words VALUES (?, ?, ?, ?)', self.pending)
+		connection.commit()
+		self.pending = list()
+
+# fingerprint of the dictionary files of a language: names, sizes and modification times
+def dict_fingerprint(paths):
+	files = list()
+	for path in sorted(paths):
+		stat = os.stat(path)
+		files.append([os.path.basename(path), stat.st_size, stat.st_mtime_ns])
+	return hashlib.sha1(str(files).encode('utf-8')).hexdigest()
+
+# cache of the current process, opened on first use
+word_caches = dict()
+
+# returns the word cache inside ct.CACHE_PATH, None if it is disabled
+def get_word_cache():
+	if not ct.WORD_CACHE or ct.CACHE_PATH == None:
+		return None
+	if not ct.CACHE_PATH in word_caches:
+		word_caches[ct.CACHE_PATH] = WordCache(ct.CACHE_PATH)
+	return word_caches[ct.CACHE_PATH]
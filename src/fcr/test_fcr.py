@@ -23,7 +23,7 @@ def test_model_fcr(test_set, model_name):
 			info = json.loads(line)
 			image_path = info["image"]
 			gt_label = info["font"]
-			img = cv2.imread(image_path)
+			img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
 			block = Block(img)
 			_, inverted_image = bin_otsu(img)
 			block.inv_image = inverted_image
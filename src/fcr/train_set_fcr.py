@@ -22,7 +22,7 @@ def create_train_set_fcr(json_set, max_chars, set_name):
 				font = info['font']
 				if font in ct.FONTS:
 					path = info['image']
-					img = cv2.imread(path)
+					img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
 					_, inverted_image = bin_otsu(img)
 					lines = combiseg(inverted_image)
 					train_chars = char_seg(inverted_image, lines, max_chars)
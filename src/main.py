@@ -2,13 +2,11 @@ import argparse
 import configparser
 import time
 import constants.constants as ct
+import os
 from constants.subparsers import SUBPARSERS
-from fcr.train_set_fcr import create_train_set_fcr
-from fcr.train_fcr import train_model_fcr
-from fcr.test_fcr import test_model_fcr
-from enhance.pages_improve import improve_pages
-from ocr.pipe.apply import apply_on_images
-from data_extraction_s3.extract import prepare_data
+from enhance.issue_parser import find_issues
+from enhance.sidecar import write_merged
+from enhance.epr_scan import scan_issues
 
 # reads config.ini to change some constants
 def read_config():
@@ -33,10 +31,14 @@ def read_config():
     for pattern in configP.get(section, "target_types").split(","):
         final.append(pattern.split("->"))
     ct.BLOCK_TYPES_ALTO = final
+    item_types = configP.get(section, "target_item_types", fallback="")
+    ct.TARGET_ITEM_TYPES = set(item_types.split(",")) if item_types.strip() != "" else None
     ct.MIN_YEAR = int(configP.get(section, "min_year"))
     ct.MAX_YEAR = int(configP.get(section, "max_year"))
     for vowel in configP.get(section, "vowels"):
         ct.VOWELS.add(vowel.lower())
+    ct.LINE_MIN_DICT = float(configP.get(section, "line_min_dict", fallback=ct.LINE_MIN_DICT))
+    ct.LINE_MAX_GARBAGE = float(configP.get(section, "line_max_garbage", fallback=ct.LINE_MAX_GARBAGE))
 
     section = "language recognition config"
     ct.STOP_WORDS_THRESH = float(configP.get(section, "stop_words_thresh"))
@@ -61,11 +63,56 @@ def read_config():
 
 #enhance action
 def enhance(args):
+    # ocr models (tensorflow, kraken) are only imported by the actions running ocr
+    from enhance.pages_improve import improve_pages
+    from enhance.scheduler import improve_blocks
+    from enhance.budget import improve_budget
+    from data_extraction_s3.extract import prepare_data
+
+    ct.COMPACT_JSON = args.compact
+    if args.compression not in ["json", "gz", "bz2"]:
+        print("unknown compression " + args.compression + ", please use json, gz or bz2")
+        exit()
+    ct.PAGE_EXTENSION = ".json" if args.compression == "json" else ".json." + args.compression
+    ct.CACHE_PATH = args.cache
+    ct.OCR_CACHE_SIZE = args.cache_size
+    ct.RASTER_CACHE_SIZE = args.raster_cache
+    ct.WORD_CACHE = args.word_cache
+    ct.LINE_OCR = args.lines
+    ct.PAGE_LINES = args.page_lines
+    ct.TRIAGE = args.triage
+    if args.raster_cache > 0 and args.cache == None:
+        print("the raster cache requires a cache directory (--cache), page rasters are not cached")
+    if args.word_cache and args.cache == None:
+        print("the word cache requires a cache directory (--cache), spell checks are not cached")
+    directory = args.directory
     if args.directory and args.directory.endswith(".s3cfg"):
-        local_directory = prepare_data(config_file_path=args.directory)
-        improve_pages(local_directory, args.required)
-    else:    
-        improve_pages(args.directory, args.required)
+        directory = prepare_data(config_file_path=args.directory, extract=not args.jsonl)
+    if (args.blocks or args.budget > 0) and args.jsonl:
+        print("block scheduling requires single page files, streaming the pages jsonl of whole issues instead")
+    if args.budget > 0 and not args.jsonl:
+        improve_budget(directory, args.required, args.workers, args.budget, args.cpu_budget, args.force, args.sparse)
+    elif args.blocks and not args.jsonl:
+        improve_blocks(directory, args.required, args.workers, args.force, args.sparse)
+    else:
+        improve_pages(directory, args.required, args.workers, args.threads, args.force, args.jsonl, args.sparse)
+
+#merge action
+def merge(args):
+    for issue_path in find_issues(args.directory):
+        n_pages = write_merged(issue_path)
+        print("merged sidecar into " + str(n_pages) + " pages of " + issue_path)
+
+#epr-scan action
+def epr_scan(args):
+    ct.CACHE_PATH = args.cache
+    ct.WORD_CACHE = args.word_cache
+    if args.word_cache and args.cache == None:
+        print("the word cache requires a cache directory (--cache), spell checks are not cached")
+    output = args.output
+    if output == None:
+        output = os.path.join(args.directory, "epr-scan.csv")
+    scan_issues(args.directory, output, args.workers)
 
 ############################## start ##############################
 print("\nStarting OCR Enhancement \n")
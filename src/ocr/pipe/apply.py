@@ -25,7 +25,7 @@ def apply_on_images(images_dir, alto, visual, confidence):
 				paths.append(root + '/' + f)
 
 	for path in tqdm(paths):
-		img = cv2.imread(path)
+		img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
 		block = Block(img)
 		block.name = path.split('/')[-1]
 		block = ocr(block, models, alto=alto)
@@ -5,13 +5,13 @@ import numpy as np
 # binarizes an image and returns it together with the inverted version
 def bin_otsu(original):
 
-	image = None
+	image = original
 
-	# image to binary
+	# images are decoded as single-channel grayscale, color images are only converted for backward compatibility
 	if not len(original.shape) == 2:
 		image = cv2.cvtColor(original, cv2.COLOR_BGR2GRAY)
-	else:
-		image = original
+
+	# image to binary
 	_, thresh = cv2.threshold(image, 0, 255, cv2.THRESH_BINARY_INV+cv2.THRESH_OTSU)
 
 
@@ -41,7 +41,7 @@ def bin_otsu(original):
 	temp_image = cv2.dilate(temp_image, kernel, iterations=1)
 	
 	# pad image
-	padded_image = cv2.copyMakeBorder(temp_image, 0, 0, ct.LINE_IMG_PAD, ct.LINE_IMG_PAD, cv2.BORDER_CONSTANT, value=(0, 0, 0))
+	padded_image = cv2.copyMakeBorder(temp_image, 0, 0, ct.LINE_IMG_PAD, ct.LINE_IMG_PAD, cv2.BORDER_CONSTANT, value=0)
 
 	# invert image
 	inv_padded_image = cv2.bitwise_not(padded_image)
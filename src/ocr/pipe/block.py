@@ -29,6 +29,10 @@ class Block:
 		garbage_ori (Union[Any, None]): Original garbage information associated with the text block.
 		trigrams_ori (Union[Any, None]): Original trigrams information associated with the text block.
 		enhance (Union[Any, None]): Enhancement information associated with the text block.
+		cached (bool): Boolean indicating if the ocr results were taken from the ocr cache.
+		lines_ori (Union[Any, None]): Coordinates and text of the lines of the original OCR output.
+		ocr_lines (Union[List[int], None]): Indices of the lines in lines_ori to be recognized again, None to recognize the whole block.
+		triage (Union[str, None]): Reason why the block was dropped before binarization, None if it was not dropped.
 
 	Methods:
 		__init__(self, arg): Constructor method for the Block class.
@@ -76,6 +80,10 @@ class Block:
 		self.garbage_ori = None
 		self.trigrams_ori = None
 		self.enhance = None
+		self.cached = False
+		self.lines_ori = None
+		self.ocr_lines = None
+		self.triage = None
 
 	# returns a string version of the ocr output of the block
 	def __str__(self):
@@ -0,0 +1,129 @@
+import os
+import json
+import time
+import hashlib
+import numpy as np
+import constants.constants as ct
+from ocr.pipe.models import Models
+from ocr.pipe.sqlite_store import SqliteStore
+
+# name of the sqlite database inside the cache directory
+OCR_CACHE_NAME = 'ocr.sqlite'
+
+# the cache size is checked after this many new entries
+EVICTION_INTERVAL = 100
+
+# share of the maximum size that is kept when evicting
+EVICTION_TARGET = 0.9
+
+# persistent cache of block ocr results, keyed by the pixels of the block crop and the models used
+# - entries are evicted in least recently used order once the cache exceeds max_bytes
+# - connections and locking as for all persistent caches (see "SqliteStore")
+class OcrCache(SqliteStore):
+
+	def __init__(self, directory, max_bytes):
+		super().__init__(os.path.join(directory, OCR_CACHE_NAME), [
+			'CREATE TABLE IF NOT EXISTS blocks (key TEXT PRIMARY KEY, value TEXT, size INTEGER, used REAL)',
+			'CREATE INDEX IF NOT EXISTS blocks_used ON blocks (used)'
+		])
+		self.max_bytes = max_bytes
+		self.new_entries = 0
+		self.hits = 0
+		self.lookups = 0
+
+	# returns the cached results for key (None if not cached) and marks them as recently used
+	def get(self, key):
+		with self.lock:
+			connection = self.connect()
+			self.lookups += 1
+			row = connection.execute('SELECT value FROM blocks WHERE key = ?', (key,)).fetchone()
+			if row == None:
+				return None
+			connection.execute('UPDATE blocks SET used = ? WHERE key = ?', (time.time(), key))
+			connection.commit()
+			self.hits += 1
+		return json.loads(row[0])
+
+	def put(self, key, value):
+		value = json.dumps(value, ensure_ascii=False, default=to_builtin)
+		with self.lock:
+			connection = self.connect()
+			connection.execute('INSERT OR REPLACE INTO blocks VALUES (?, ?, ?, ?)', (key, value, len(value), time.time()))
+			connection.commit()
+			self.new_entries += 1
+			if self.new_entries % EVICTION_INTERVAL == 1:
+				self.evict()
+
+	# removes least recently used entries until the cache is below EVICTION_TARGET of max_bytes (called holding the lock)
+	def evict(self):
+		connection = self.connect()
+		total = connection.execute('SELECT COALESCE(SUM(size), 0) FROM blocks').fetchone()[0]
+		if total <= self.max_bytes:
+			return
+		target = self.max_bytes * EVICTION_TARGET
+		removed = list()
+		for key, size in connection.execute('SELECT key, size FROM blocks ORDER BY used'):
+			if total <= target:
+				break
+			removed.append((key,))
+			total -= size
+		connection.executemany('DELETE FROM blocks WHERE key = ?', removed)
+		connection.commit()
+
+# numpy values inside ocr_words and lines (boxes and confidences) are stored as plain numbers
+def to_builtin(value):
+	if isinstance(value, (np.generic, np.ndarray)):
+		return value.tolist()
+	raise TypeError(str(type(value)) + ' is not serializable')
+
+# cache of the current process, opened on first use
+caches = dict()
+
+# returns the ocr cache inside ct.CACHE_PATH, None if caching is disabled
+def get_cache():
+	if ct.CACHE_PATH == None:
+		return None
+	if not ct.CACHE_PATH in caches:
+		caches[ct.CACHE_PATH] = OcrCache(ct.CACHE_PATH, ct.OCR_CACHE_SIZE * 1024 * 1024)
+	return caches[ct.CACHE_PATH]
+
+# key of a block: hash of its crop, the fingerprint of the models and all parameters influencing binarization,
+# segmentation and font recognition (with given lines also the lines of the original ocr and, in line mode, the
+# selected lines)
+def block_key(block, models: Models):
+	image = np.ascontiguousarray(block.image)
+	sha1 = hashlib.sha1()
+	sha1.update(str((image.shape, str(image.dtype))).encode('utf-8'))
+	sha1.update(image.data)
+	params = [ct.FONTS, ct.LINE_IMG_PAD, ct.N_CHARS_FCR, ct.P1, ct.P2, ct.P3, ct.P4, ct.P5, ct.P6, ct.P7, ct.P8]
+	if block.lines_ori != None:
+		params.append([block.lines_ori, block.ocr_lines, block.offset_alto])
+	sha1.update(json.dumps(params).encode('utf-8'))
+	return sha1.hexdigest() + '-' + models.fingerprint()
+
+# sets the cached ocr results of a block, returns False if the block is not cached
+def load_cached(block, models: Models):
+	cache = get_cache()
+	if cache == None:
+		return False
+	value = cache.get(block_key(block, models))
+	if value == None:
+		return False
+	block.ocr = value['ocr']
+	block.ocr_words = value['ocr_words']
+	block.font = value['font']
+	block.lines = value['lines']
+	block.cached = True
+	return True
+
+# stores the ocr results of a recognized block
+def store_cached(block, models: Models):
+	cache = get_cache()
+	if cache == None or block.ocr == None:
+		return
+	cache.put(block_key(block, models), {
+		'ocr': block.ocr,
+		'ocr_words': block.ocr_words,
+		'font': block.font,
+		'lines': block.lines
+	})
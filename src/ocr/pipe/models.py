@@ -1,10 +1,12 @@
 
 import os
 import json
+import hashlib
 import constants.constants as ct
 import numpy as np
 from kraken.lib.models import load_any
 from tensorflow import keras
+from epr.knn_epr import read_epr_model
 
 # class grouping all ml models that could be involved
 class Models:
@@ -13,6 +15,8 @@ class Models:
 		self.ocr = dict()
 		self.fcr = None
 		self.epr = None
+		self.files = dict()
+		self.hash = None
 
 	# loads all required models to apply ocr - they should be stored in /models/final/
 	def load_final_models(self, require_enhance):
@@ -20,11 +24,13 @@ class Models:
 			for f in files:
 				if f.endswith('.h5'):
 					self.fcr = self.load_tensorflow_model(root + '/' + f)
+					self.files['fcr'] = root + '/' + f
 					print("loaded " + f)
 					continue
 				for font in ct.FONTS:
 					if font in f and f.endswith('.mlmodel'):
 						self.ocr[font] = self.load_kraken_model(root + '/' + f)
+						self.files['ocr_' + font] = root + '/' + f
 						print("loaded " + f)
 						break
 				if f.endswith('.jsonl') and require_enhance:
@@ -36,6 +42,26 @@ class Models:
 		if self.fcr == None:
 			self.missing_final_models()
 
+	# fingerprint of the loaded font recognition and ocr models (enhancement prediction is not included)
+	def fingerprint(self):
+		if self.hash == None:
+			sha1 = hashlib.sha1()
+			for name in sorted(self.files):
+				sha1.update(name.encode('utf-8'))
+				with open(self.files[name], 'rb') as f:
+					for chunk in iter(lambda: f.read(1 << 20), b''):
+						sha1.update(chunk)
+			self.hash = sha1.hexdigest()
+		return self.hash
+
+	# only loads the enhancement prediction model stored in /models/final/ (if any)
+	def load_final_epr_model(self):
+		for root, _, files in os.walk(ct.MODELS_PATH + 'final/'):
+			for f in files:
+				if f.endswith('.jsonl'):
+					self.epr = self.load_json_model(root + '/' + f)
+					print("loaded " + f)
+
 	# at least one model is missing in /models/final/
 	def missing_final_models(self):
 		print("not all required models found in " + ct.MODELS_PATH + "final/, please consult " + ct.MODELS_PATH + "final/info.txt")
@@ -48,6 +74,8 @@ class Models:
 			for f in files:
 				if f == name or f == name + '.h5':
 					self.fcr = self.load_tensorflow_model(root + '/' + f)
+					self.files['fcr'] = root + '/' + f
+					self.hash = None
 					loaded = True
 		if not loaded:
 			self.model_not_loaded(name)
@@ -81,41 +109,7 @@ class Models:
 
 	# loads epr model at path
 	def load_json_model(self, path):
-		x_values = list()
-		y_values = list()
-		chars = list()
-		trigrams = dict()
-		k = None
-		counter = 0
-		with open(path, 'r', encoding='utf-8') as lines:
-			for line in lines:
-				counter += 1
-				info = json.loads(line)
-
-				# load language trigrams
-				if counter == 1:
-					trigrams = info
-					model_langs = set([k for k in trigrams])
-					target_langs = set(ct.SUPPORTED_LANGS)
-					if not model_langs == target_langs:
-						print("warning: epr model languages don't match supported languages in config.ini")
-				# load models
-				elif 'k' in info:
-					k = info['k']
-				else:
-					x_values.append(info['x'])
-					y_values.append(info['y'])
-					chars.append(info['chars'])
-		
-		model = {
-			'x': np.array(x_values),
-			'y': np.array(y_values),
-			'chars': np.array(chars),
-			'trigrams': trigrams,
-			'k': k
-		}
-
-		return model
+		return read_epr_model(path)
 
 	def model_not_loaded(self, name):
 		print("couldn't find and load model named " + name)
@@ -1,10 +1,13 @@
 from ocr.pipe.bin import bin_otsu
-from seg.apply_seg import combiseg
+from seg.apply_seg import combiseg, given_boxes, page_boxes
 from fcr.apply_fcr import predict_font
 from ocr.pipe.models import Models
 # from ocr.pipe.block import Block
 from enhance.page_parser import Block
 from ocr.pipe.pred import Predictor
+from ocr.pipe.cache import load_cached, store_cached
+from ocr.pipe.triage import triage_block
+import constants.constants as ct
 # from ocr.pipe.alto import generate_alto
 
 # ocr applied on image using models object
@@ -19,18 +22,90 @@ def ocr(block: Block, models: Models) -> Block:
 	Returns:
 		Block: The Block object updated with OCR results.
 
+	Note:
+		If the ocr cache is enabled (ct.CACHE_PATH), results of a block with the same crop and models are
+		taken from the cache, without binarization, segmentation, font or character recognition.
+
 	Example:
 		>>> block = ocr(<Block object>, <Models object>)
 		>>> print(block)
 		<Updated Block object>
 	"""
+	load_cached(block, models)
+	block = preprocess(block)
+	block = recognize(block, models)
+	
+	# # alto generation
+	# if alto:
+	# 	block.ocr_alto = generate_alto(block, addOffset)
+
+	return block
+
+# binarization and segmentation, only relying on opencv and numpy (no models involved)
+def preprocess(block: Block) -> Block:
+	"""
+	Binarize the image of a block and segment it into text lines.
+
+	Args:
+		block (Block): The Block object containing the image.
+
+	Returns:
+		Block: The Block object updated with 'bin_image', 'inv_image' and 'lines'.
+
+	Note:
+		This stage does not use any model and mostly runs inside OpenCV, which releases the GIL,
+		so that it can be run on multiple threads in parallel to recognition. Blocks found in the ocr cache are skipped.
+		In line mode (block.ocr_lines set), 'lines' holds the boxes of the selected lines of the original ocr instead
+		of the segmented lines (blocks without selected lines are removed by "process_pages_file"). Otherwise, if the
+		lines of the original ocr are given (block.lines_ori), their boxes are used and the block is only segmented
+		if they are inconsistent (see "given_boxes"). With ct.TRIAGE, hopeless blocks are dropped before
+		binarization, their 'triage' holds the reason (see "triage_block").
+	"""
+	if block.cached:
+		return block
+
+	# triage
+	if ct.TRIAGE:
+		block.triage = triage_block(block)
+		if block.triage != None:
+			return block
+
 	# binarization
 	bin_image, inv_image = bin_otsu(block.image)
 	block.bin_image = bin_image
 	block.inv_image = inv_image
 
-	# segmentation
-	block.lines = combiseg(block.inv_image)
+	# segmentation, in line mode the selected lines of the original ocr are used
+	if block.ocr_lines != None:
+		block.lines = page_boxes([block.lines_ori[i][0] for i in block.ocr_lines], block.offset_alto, len(inv_image[0]), len(inv_image))
+	else:
+		boxes = None
+		if block.lines_ori != None:
+			boxes = given_boxes([coords for coords, _ in block.lines_ori], block.offset_alto, len(inv_image[0]), len(inv_image))
+		block.lines = boxes if boxes != None else combiseg(block.inv_image)
+
+	return block
+
+# font and character recognition on a preprocessed block
+def recognize(block: Block, models: Models) -> Block:
+	"""
+	Apply font recognition and character recognition on a preprocessed block.
+
+	Args:
+		block (Block): The Block object, already processed by preprocess.
+		models (Models): The Models object containing the necessary models for OCR.
+
+	Returns:
+		Block: The Block object updated with 'font', 'ocr' and 'ocr_words'.
+
+	Note:
+		Blocks found in the ocr cache and blocks dropped by the triage are skipped, the results of all other blocks
+		are added to the cache.
+		In line mode (block.ocr_lines set), only the selected lines are recognized and 'ocr' holds the original
+		text with these lines replaced (see "splice_lines"), 'ocr_words' only holds the words of the recognized lines.
+	"""
+	if block.cached or block.triage != None:
+		return block
 
 	# font recognition
 	block.font = predict_font(block, models)
@@ -38,9 +113,18 @@ def ocr(block: Block, models: Models) -> Block:
 	# character recognition
 	predictor = Predictor(block, models)
 	block = predictor.kraken()
-	
-	# # alto generation
-	# if alto:
-	# 	block.ocr_alto = generate_alto(block, addOffset)
+	if block.ocr_lines != None:
+		block.ocr = splice_lines(block, predictor.line_texts)
+
+	store_cached(block, models)
+
+	return block
 
-	return block
\ No newline at end of file
+# original text of a block (one line per row) with the selected lines (block.ocr_lines) replaced by their recognized
+# text, lines that were not recognized or turned out empty keep their original text
+def splice_lines(block: Block, line_texts) -> str:
+	texts = [text for _, text in block.lines_ori]
+	for i, text in zip(block.ocr_lines, line_texts):
+		if text != '':
+			texts[i] = text
+	return '\n'.join(texts)
@@ -14,6 +14,7 @@ class Predictor:
 
 		self.block = block
 		self.models = models
+		self.line_texts = list()
 
 	# removes padding
 	def readjust_lines(self):
@@ -29,6 +30,7 @@ class Predictor:
 
 	# formats kraken ocr output so that:
 	# - block.ocr holds the plain text of the ocr output
+	# - line_texts holds the text of every line box, empty if nothing was recognized
 	# - block.ocr_words holds a list, equaling
 	# [
 	# [ ["word1_row1", [x1, y1, x2, y2], confidence_string], ["word2_row1", [x1, y1, x2, y2], confidence_string] ]
@@ -51,6 +53,7 @@ class Predictor:
 		for line in output:
 			txt = str(line)
 			if txt == '' or txt.isspace():
+				self.line_texts.append('')
 				continue
 			self.block.ocr_words.append(list())
 			indices = self.post_process(txt)
@@ -78,6 +81,7 @@ class Predictor:
 				self.block.ocr_words[-1].append([word, box, confidences])
 				line_words.append(word)
 			line_strings.append(' '.join(line_words))
+			self.line_texts.append(line_strings[-1])
 		self.block.ocr = '\n'.join(line_strings)	
 
 	# improves kraken character bounding boxes so that neighbouring boxes "touch" each other
@@ -0,0 +1,33 @@
+import os
+import sqlite3
+import threading
+
+# sqlite database of a persistent cache (block ocr cache, epr feature store, word cache), created on first use
+# - every process opens its own connection, so that forked workers can share the database
+# - the connection is shared by the threads of a process (pipelined execution) through a lock
+# - schema holds the statements creating the tables and indices (IF NOT EXISTS)
+class SqliteStore:
+
+	def __init__(self, path, schema):
+		self.path = path
+		self.schema = schema
+		self.lock = threading.Lock()
+		self.connection = None
+		self.pid = None
+
+	# returns the connection of the current process, creating the database if necessary
+	def connect(self):
+		if self.connection == None or self.pid != os.getpid():
+			os.makedirs(os.path.dirname(self.path), exist_ok=True)
+			self.connection = sqlite3.connect(self.path, timeout=60, check_same_thread=False)
+			self.connection.execute('PRAGMA journal_mode=WAL')
+			for statement in self.schema:
+				self.connection.execute(statement)
+			self.connection.commit()
+			self.pid = os.getpid()
+			self.opened()
+		return self.connection
+
+	# called once a process opened its connection, e.g. to drop state inherited from the parent process
+	def opened(self):
+		pass
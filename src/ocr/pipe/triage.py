@@ -0,0 +1,46 @@
+import cv2
+import numpy as np
+import constants.constants as ct
+
+# reasons for dropping a block, in the order they are checked
+TRIAGE_REASONS = ['small', 'blank', 'dense', 'rotated']
+
+# cheap check of the cropped grayscale image of a block before binarization, returns the reason for dropping the block
+# (one of TRIAGE_REASONS) or None if the block is worth running ocr on
+# - small: a side of the block is too short to hold a text line, or the block is a thin strip (rules, separators)
+# - blank: hardly any ink or no contrast between ink and background (empty or near-blank crops)
+# - dense: more ink than text can have (pictures, halftones, black areas)
+# - rotated: the ink varies more from column to column than from row to row, i.e. the text lines run vertically
+# only every TRIAGE_STRIDE-th row and column of the image is looked at, so that a block takes well below 1 ms
+def triage_block(block):
+
+	height, width = block.image.shape[:2]
+	if min(height, width) < ct.TRIAGE_MIN_SIDE or max(height, width) > ct.TRIAGE_MAX_ASPECT * min(height, width):
+		return 'small'
+
+	image = np.ascontiguousarray(block.image[::ct.TRIAGE_STRIDE, ::ct.TRIAGE_STRIDE])
+	if not len(image.shape) == 2:
+		image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+	# ink density, the smaller class of the otsu threshold being the ink (dark on light or light on dark)
+	_, ink = cv2.threshold(image, 0, 255, cv2.THRESH_BINARY_INV+cv2.THRESH_OTSU)
+	density = cv2.countNonZero(ink) / ink.size
+	if density > 0.5:
+		ink = cv2.bitwise_not(ink)
+		density = 1 - density
+	contrast = abs(cv2.mean(image, cv2.bitwise_not(ink))[0] - cv2.mean(image, ink)[0])
+	if density < ct.TRIAGE_MIN_INK or contrast < ct.TRIAGE_MIN_CONTRAST:
+		return 'blank'
+	if density > ct.TRIAGE_MAX_INK:
+		return 'dense'
+
+	# dominant orientation from the projection profiles: text lines and the gaps between them make the row profile vary
+	rows = cv2.reduce(ink, 1, cv2.REDUCE_AVG, dtype=cv2.CV_32F)
+	columns = cv2.reduce(ink, 0, cv2.REDUCE_AVG, dtype=cv2.CV_32F)
+	rows_variation = np.std(rows) / max(np.mean(rows), 1e-6)
+	columns_variation = np.std(columns) / max(np.mean(columns), 1e-6)
+	if columns_variation > ct.TRIAGE_ROTATION * rows_variation:
+		block.rotated = True
+		return 'rotated'
+
+	return None
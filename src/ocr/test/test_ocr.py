@@ -8,10 +8,13 @@ from lxml import etree
 from tqdm import tqdm
 import cv2
 import json
+import time
 import os
 
 # tests ocr on a test set defined through a json file
-def test_on_set(test_set, visual, confidence):
+# - with page_lines, the line coordinates [x, y, w, h] listed as 'lines' of a test block (relative to its image)
+#   are used instead of segmenting the block, as by enhance with the page_lines option
+def test_on_set(test_set, visual, confidence, page_lines=False):
 	if not os.path.isfile(test_set):
 		print("cannot find " + test_set)
 		exit()
@@ -25,6 +28,7 @@ def test_on_set(test_set, visual, confidence):
 
 	# open test set json file
 	total = 0
+	ocr_seconds = 0
 	with open(test_set, 'r', encoding='utf-8') as lines:
 		lines = [line for line in lines]
 		for line in tqdm(lines):
@@ -32,7 +36,7 @@ def test_on_set(test_set, visual, confidence):
 			if not 'image' in info or not 'gt' in info or not 'id' in info:
 				print("json line does not include required 'image', 'gt' and 'id' properties")
 				continue
-			image = cv2.imread(info['image'])
+			image = cv2.imread(info['image'], cv2.IMREAD_GRAYSCALE)
 
 			block = Block(image)
 
@@ -44,7 +48,13 @@ def test_on_set(test_set, visual, confidence):
 			block.name = info['id']
 
 			block.ocr_gt = get_alto_text(info['gt'], gt_block_id)
+			if page_lines and 'lines' in info:
+				block.lines_ori = [(coords, '') for coords in info['lines']]
+				block.offset_alto = (0, 0)
+			before = time.time()
 			block = ocr(block, models)
+			ocr_seconds += time.time() - before
+			total += 1
 			block.score = new_ocr_scoring.get_score(block, new_ocr=True, average=False)
 			
 			# compare to original ocr output
@@ -64,6 +74,8 @@ def test_on_set(test_set, visual, confidence):
 	print("new ocr score:\t" + str(round(new_ocr_scoring.get_set_score(), 3)))
 	if original_ocr_scoring.get_set_score() != None:
 		print("ori ocr score:\t" + str(round(original_ocr_scoring.get_set_score(), 3)))
+	if total > 0:
+		print("ocr time:\t" + str(round(ocr_seconds / total * 1000)) + " ms per block")
 				
 
 # retrieves text of TextBlock from an alto xml file at alto_path (no block_id sugggest file contains only one block)
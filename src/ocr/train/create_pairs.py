@@ -73,7 +73,7 @@ def add_existing_pairs(existing_dir, set_name):
 				if label != None:	
 					for font in ct.FONTS:
 						if font in path:
-							img = bin_otsu(cv2.imread(path))[0]
+							img = bin_otsu(cv2.imread(path, cv2.IMREAD_GRAYSCALE))[0]
 							save_pair(img, set_name, font, label, 'existing')
 							break
 
@@ -269,7 +269,7 @@ def create_train_pairs(gt_set, confidence, set_name, existing_dir, n_lines, n_ar
 					print("json line does not include required 'image' and 'gt' properties")
 					break
 				info = json.loads(line)
-				image = cv2.imread(info['image'])
+				image = cv2.imread(info['image'], cv2.IMREAD_GRAYSCALE)
 				bin_img, inv_img = bin_otsu(image)
 				block = Block(image)
 				block.inv_image = inv_img
@@ -30,6 +30,36 @@ def adjust_boxes(boxes, im_w, im_h):
 		new_boxes.append((x1, y1, x2, y2))
 	return combine_boxes(new_boxes)
 
+# converts line coordinates [x, y, w, h] of the page into line bounding boxes of the padded binary image of a block
+# at offset (x, y), extended like the boxes of combiseg (one box per line, no boxes are combined)
+def page_boxes(line_coords, offset, im_w, im_h):
+
+	boxes = list()
+	for coords in line_coords:
+		x = coords[0] - offset[0] + ct.LINE_IMG_PAD
+		y = coords[1] - offset[1]
+		x1 = max(0, int(x - ct.LINE_IMG_PAD))
+		y1 = max(0, int(y - ct.P8))
+		x2 = min(im_w, int(x + coords[2] + ct.LINE_IMG_PAD))
+		y2 = min(im_h, int(y + coords[3] + ct.P8))
+		boxes.append([x1, y1, x2, y2])
+	return boxes
+
+# line bounding boxes of a block from the line coordinates [x, y, w, h] of the page (see "page_boxes"), None if they
+# are missing or inconsistent with the block (a line without extent or whose center lies outside of the block)
+def given_boxes(line_coords, offset, im_w, im_h):
+
+	if line_coords == None or len(line_coords) == 0:
+		return None
+	for coords in line_coords:
+		if len(coords) != 4 or coords[2] <= 0 or coords[3] <= 0:
+			return None
+		center_x = coords[0] - offset[0] + coords[2] / 2
+		center_y = coords[1] - offset[1] + coords[3] / 2
+		if center_x < 0 or center_x > im_w - 2 * ct.LINE_IMG_PAD or center_y < 0 or center_y > im_h:
+			return None
+	return page_boxes(line_coords, offset, im_w, im_h)
+
 # combines boxes that overlap vertically
 def combine_boxes(boxes):
 
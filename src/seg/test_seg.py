@@ -58,7 +58,7 @@ def test_segmentation(test_set):
 			gt_boxes = get_boxes(info['gt'])
 			if gt_boxes == None or len(gt_boxes) < 2:
 				continue
-			image = cv2.imread(info['image'])
+			image = cv2.imread(info['image'], cv2.IMREAD_GRAYSCALE)
 			block_counter += 1
 			_, inv = bin_otsu(image)
 			combiseg_loss += evaluate(combiseg(inv), gt_boxes)